@@ -0,0 +1,23 @@
+"""
+Generates precomputed Blowfish key schedules for services with static keys.
+Rerun after changing any of the keys:
+```
+python bfschedule.py
+```
+"""
+import os, blowfish, cdkm, ircm
+
+SNAPSHOTS: list[tuple[bytes, str]] = [
+  (ircm.BLOWFISH_KEY, ircm.BLOWFISH_SNAPSHOT),
+  (cdkm.BLOWFISH_KEY, cdkm.BLOWFISH_SNAPSHOT)
+]
+"""Static keys and their snapshot paths."""
+
+def main():
+  for key, path in SNAPSHOTS:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    blowfish.save_schedule(key, path)
+    print(f"Saved key schedule to {path}")
+
+if __name__ == "__main__":
+  main()
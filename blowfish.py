@@ -1,4 +1,4 @@
-import secrets, utils
+import functools, hashlib, importlib.util, secrets, struct, utils
 
 ORIG_P = [
   0x243F6A88, 0x85A308D3, 0x13198A2E, 0x03707344,
@@ -277,6 +277,18 @@ ORIG_S = [
 ]
 """Blowfish S-boxes."""
 
+CIPHER_CACHE_SIZE = 64
+"""Max number of key schedules kept by `get_cipher`."""
+
+SCHEDULE_FORMAT = struct.Struct(f'<32s{18 + 4 * 256}I')
+"""Key schedule snapshot layout: SHA-256 of the key, p-array, flattened S-boxes."""
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+"""NumPy is installed. It's only imported on first vectorized call, keeping service startup fast."""
+
+VECTORIZE_MIN_BLOCKS = 32
+"""Min number of blocks for `Cipher` to use the NumPy backend, if NumPy is installed."""
+
 class Blowfish:
   """Blowfish implementation rewritten from https://github.com/Rupan/blowfish."""
   N = 16
@@ -292,6 +304,14 @@ class Blowfish:
         self.S[i].append(ORIG_S[i][j])
     self.__init(key)
 
+  @classmethod
+  def from_schedule(cls, P: list[int], S: list[int]):
+    """Creates an instance from a saved key schedule. `S` holds the 4 S-boxes flattened into 1024 entries."""
+    bf = cls.__new__(cls)
+    bf.P = list(P)
+    bf.S = [list(S[i:i + 256]) for i in range(0, 1024, 256)]
+    return bf
+
   def F(self, x: int):
     d = x & 0xFF
     x >>= 8
@@ -360,50 +380,277 @@ class Blowfish:
         self.S[i][j+1] = datar
         j += 2
 
+class FastBlowfish:
+  """Table-driven Blowfish engine, bit-for-bit identical to `Blowfish`.
+
+  S-boxes are flattened into a single 1024-entry list (box `i` starts at `i * 256`), tables are bound to locals and the 16 rounds are unrolled."""
+  N = 16
+
+  def __init__(self, key: bytes):
+    self.P = list(ORIG_P)
+    self.S = [nb for box in ORIG_S for nb in box]
+    self.__init(key)
+
+  @classmethod
+  def from_schedule(cls, P: list[int], S: list[int]):
+    """Creates an instance from a saved key schedule. `S` holds the 4 S-boxes flattened into 1024 entries."""
+    bf = cls.__new__(cls)
+    bf.P = list(P)
+    bf.S = list(S)
+    return bf
+
+  def F(self, x: int):
+    S = self.S
+    return ((S[x >> 24 & 0xFF] + S[256 | x >> 16 & 0xFF]) ^ S[512 | x >> 8 & 0xFF]) + S[768 | x & 0xFF]
+
+  def encrypt(self, xl: int, xr: int):
+    p0, p1, p2, p3, p4, p5, p6, p7, p8, p9, p10, p11, p12, p13, p14, p15, p16, p17 = self.P
+    S = self.S
+    xl ^= p0
+    xr ^= ((S[xl >> 24 & 0xFF] + S[256 | xl >> 16 & 0xFF]) ^ S[512 | xl >> 8 & 0xFF]) + S[768 | xl & 0xFF]
+    xr ^= p1
+    xl ^= ((S[xr >> 24 & 0xFF] + S[256 | xr >> 16 & 0xFF]) ^ S[512 | xr >> 8 & 0xFF]) + S[768 | xr & 0xFF]
+    xl ^= p2
+    xr ^= ((S[xl >> 24 & 0xFF] + S[256 | xl >> 16 & 0xFF]) ^ S[512 | xl >> 8 & 0xFF]) + S[768 | xl & 0xFF]
+    xr ^= p3
+    xl ^= ((S[xr >> 24 & 0xFF] + S[256 | xr >> 16 & 0xFF]) ^ S[512 | xr >> 8 & 0xFF]) + S[768 | xr & 0xFF]
+    xl ^= p4
+    xr ^= ((S[xl >> 24 & 0xFF] + S[256 | xl >> 16 & 0xFF]) ^ S[512 | xl >> 8 & 0xFF]) + S[768 | xl & 0xFF]
+    xr ^= p5
+    xl ^= ((S[xr >> 24 & 0xFF] + S[256 | xr >> 16 & 0xFF]) ^ S[512 | xr >> 8 & 0xFF]) + S[768 | xr & 0xFF]
+    xl ^= p6
+    xr ^= ((S[xl >> 24 & 0xFF] + S[256 | xl >> 16 & 0xFF]) ^ S[512 | xl >> 8 & 0xFF]) + S[768 | xl & 0xFF]
+    xr ^= p7
+    xl ^= ((S[xr >> 24 & 0xFF] + S[256 | xr >> 16 & 0xFF]) ^ S[512 | xr >> 8 & 0xFF]) + S[768 | xr & 0xFF]
+    xl ^= p8
+    xr ^= ((S[xl >> 24 & 0xFF] + S[256 | xl >> 16 & 0xFF]) ^ S[512 | xl >> 8 & 0xFF]) + S[768 | xl & 0xFF]
+    xr ^= p9
+    xl ^= ((S[xr >> 24 & 0xFF] + S[256 | xr >> 16 & 0xFF]) ^ S[512 | xr >> 8 & 0xFF]) + S[768 | xr & 0xFF]
+    xl ^= p10
+    xr ^= ((S[xl >> 24 & 0xFF] + S[256 | xl >> 16 & 0xFF]) ^ S[512 | xl >> 8 & 0xFF]) + S[768 | xl & 0xFF]
+    xr ^= p11
+    xl ^= ((S[xr >> 24 & 0xFF] + S[256 | xr >> 16 & 0xFF]) ^ S[512 | xr >> 8 & 0xFF]) + S[768 | xr & 0xFF]
+    xl ^= p12
+    xr ^= ((S[xl >> 24 & 0xFF] + S[256 | xl >> 16 & 0xFF]) ^ S[512 | xl >> 8 & 0xFF]) + S[768 | xl & 0xFF]
+    xr ^= p13
+    xl ^= ((S[xr >> 24 & 0xFF] + S[256 | xr >> 16 & 0xFF]) ^ S[512 | xr >> 8 & 0xFF]) + S[768 | xr & 0xFF]
+    xl ^= p14
+    xr ^= ((S[xl >> 24 & 0xFF] + S[256 | xl >> 16 & 0xFF]) ^ S[512 | xl >> 8 & 0xFF]) + S[768 | xl & 0xFF]
+    xr ^= p15
+    xl ^= ((S[xr >> 24 & 0xFF] + S[256 | xr >> 16 & 0xFF]) ^ S[512 | xr >> 8 & 0xFF]) + S[768 | xr & 0xFF]
+    return (xr ^ p17) & 0xFFFFFFFF, (xl ^ p16) & 0xFFFFFFFF
+
+  def decrypt(self, xl: int, xr: int):
+    p0, p1, p2, p3, p4, p5, p6, p7, p8, p9, p10, p11, p12, p13, p14, p15, p16, p17 = self.P
+    S = self.S
+    xl ^= p17
+    xr ^= ((S[xl >> 24 & 0xFF] + S[256 | xl >> 16 & 0xFF]) ^ S[512 | xl >> 8 & 0xFF]) + S[768 | xl & 0xFF]
+    xr ^= p16
+    xl ^= ((S[xr >> 24 & 0xFF] + S[256 | xr >> 16 & 0xFF]) ^ S[512 | xr >> 8 & 0xFF]) + S[768 | xr & 0xFF]
+    xl ^= p15
+    xr ^= ((S[xl >> 24 & 0xFF] + S[256 | xl >> 16 & 0xFF]) ^ S[512 | xl >> 8 & 0xFF]) + S[768 | xl & 0xFF]
+    xr ^= p14
+    xl ^= ((S[xr >> 24 & 0xFF] + S[256 | xr >> 16 & 0xFF]) ^ S[512 | xr >> 8 & 0xFF]) + S[768 | xr & 0xFF]
+    xl ^= p13
+    xr ^= ((S[xl >> 24 & 0xFF] + S[256 | xl >> 16 & 0xFF]) ^ S[512 | xl >> 8 & 0xFF]) + S[768 | xl & 0xFF]
+    xr ^= p12
+    xl ^= ((S[xr >> 24 & 0xFF] + S[256 | xr >> 16 & 0xFF]) ^ S[512 | xr >> 8 & 0xFF]) + S[768 | xr & 0xFF]
+    xl ^= p11
+    xr ^= ((S[xl >> 24 & 0xFF] + S[256 | xl >> 16 & 0xFF]) ^ S[512 | xl >> 8 & 0xFF]) + S[768 | xl & 0xFF]
+    xr ^= p10
+    xl ^= ((S[xr >> 24 & 0xFF] + S[256 | xr >> 16 & 0xFF]) ^ S[512 | xr >> 8 & 0xFF]) + S[768 | xr & 0xFF]
+    xl ^= p9
+    xr ^= ((S[xl >> 24 & 0xFF] + S[256 | xl >> 16 & 0xFF]) ^ S[512 | xl >> 8 & 0xFF]) + S[768 | xl & 0xFF]
+    xr ^= p8
+    xl ^= ((S[xr >> 24 & 0xFF] + S[256 | xr >> 16 & 0xFF]) ^ S[512 | xr >> 8 & 0xFF]) + S[768 | xr & 0xFF]
+    xl ^= p7
+    xr ^= ((S[xl >> 24 & 0xFF] + S[256 | xl >> 16 & 0xFF]) ^ S[512 | xl >> 8 & 0xFF]) + S[768 | xl & 0xFF]
+    xr ^= p6
+    xl ^= ((S[xr >> 24 & 0xFF] + S[256 | xr >> 16 & 0xFF]) ^ S[512 | xr >> 8 & 0xFF]) + S[768 | xr & 0xFF]
+    xl ^= p5
+    xr ^= ((S[xl >> 24 & 0xFF] + S[256 | xl >> 16 & 0xFF]) ^ S[512 | xl >> 8 & 0xFF]) + S[768 | xl & 0xFF]
+    xr ^= p4
+    xl ^= ((S[xr >> 24 & 0xFF] + S[256 | xr >> 16 & 0xFF]) ^ S[512 | xr >> 8 & 0xFF]) + S[768 | xr & 0xFF]
+    xl ^= p3
+    xr ^= ((S[xl >> 24 & 0xFF] + S[256 | xl >> 16 & 0xFF]) ^ S[512 | xl >> 8 & 0xFF]) + S[768 | xl & 0xFF]
+    xr ^= p2
+    xl ^= ((S[xr >> 24 & 0xFF] + S[256 | xr >> 16 & 0xFF]) ^ S[512 | xr >> 8 & 0xFF]) + S[768 | xr & 0xFF]
+    return (xr ^ p0) & 0xFFFFFFFF, (xl ^ p1) & 0xFFFFFFFF
+
+  def __init(self, key: bytes):
+    key_len = len(key)
+    P = self.P
+    S = self.S
+    encrypt = self.encrypt
+
+    j = 0
+    for i in range(self.N + 2):
+      data = 0x00000000
+      for _ in range(4):
+        data = ((data << 8) | key[j]) & 0xFFFFFFFF
+        j += 1
+        if j >= key_len:
+          j = 0
+      P[i] = ORIG_P[i] ^ data
+
+    datal = datar = 0x00000000
+    for i in range(0, self.N + 2, 2):
+      datal, datar = encrypt(datal, datar)
+      P[i] = datal
+      P[i+1] = datar
+
+    for i in range(0, 1024, 2):
+      datal, datar = encrypt(datal, datar)
+      S[i] = datal
+      S[i+1] = datar
+
 class Cipher:
   """Game Service implementation of Blowfish encryption."""
 
-  def __init__(self, key: bytes):
-    self.bf = Blowfish(key)
+  def __init__(self, key: bytes, engine: type[Blowfish | FastBlowfish] = FastBlowfish, snapshot: str = None):
+    self.bf = None
+    # precomputed schedule, falls back to the key schedule if missing or stale
+    if snapshot is not None:
+      self.bf = load_schedule(key, snapshot, engine)
+    if self.bf is None:
+      self.bf = engine(key)
+    self.__tables = None
 
   def encrypt(self, src: bytes):
     src_size = len(src)
     
     if src_size <= 0xFFFF:
-      leftover = src_size % 8
-      pad = leftover if leftover > 0 else 8
-      padded_size = src_size + 8 - pad
-      buf = bytearray(padded_size)
-      for i in range(src_size):
-        buf[i] = src[i]
-      ints = utils.read_as_u32_list(bytes(buf))
-      for i in range(0, len(ints), 2):
-        l, r = self.bf.encrypt(ints[i], ints[i+1])
-        ints[i] = l
-        ints[i+1] = r
-
-      buf = bytearray(utils.write_u32_list(ints))
-      buf.extend(utils.write_u16(src_size))
+      padded_size = Cipher.__padded_size(src_size)
+      # blocks and the size suffix share one output buffer
+      buf = bytearray(padded_size + 2)
+      buf[:src_size] = src
+      with memoryview(buf) as view:
+        self.__ecb(view[:padded_size], False)
+      buf[padded_size:] = utils.write_u16(src_size)
       return bytes(buf)
     
     return None
   
   def decrypt(self, src: bytes):
+    org_size, size = Cipher.__unpadded_size(src)
+    buf = bytearray(src[:size])
+    self.__ecb(buf, True)
+    del buf[org_size:]
+    return bytes(buf)
+
+  def encrypt_many(self, srcs: list[bytes]):
+    """Encrypts a batch of buffers in a single ECB pass. Buffers over 64KB yield `None`, like `encrypt`."""
+    sizes = [Cipher.__padded_size(len(src)) if len(src) <= 0xFFFF else 0 for src in srcs]
+    buf = bytearray(sum(sizes))
+    offset = 0
+    for src, size in zip(srcs, sizes):
+      if size > 0:
+        buf[offset:offset + len(src)] = src
+      offset += size
+    self.__ecb(buf, False)
+
+    result = []
+    offset = 0
+    for src, size in zip(srcs, sizes):
+      if len(src) > 0xFFFF:
+        result.append(None)
+        continue
+      result.append(bytes(buf[offset:offset + size]) + utils.write_u16(len(src)))
+      offset += size
+    return result
+
+  def decrypt_many(self, srcs: list[bytes]):
+    """Decrypts a batch of buffers in a single ECB pass."""
+    sizes = [Cipher.__unpadded_size(src) for src in srcs]
+    buf = bytearray(b''.join(memoryview(src)[:size] for src, (_, size) in zip(srcs, sizes)))
+    self.__ecb(buf, True)
+
+    result = []
+    offset = 0
+    for org_size, size in sizes:
+      result.append(bytes(buf[offset:offset + min(org_size, size)]))
+      offset += size
+    return result
+
+  def __padded_size(src_size: int):
+    """Returns the size of a buffer zero-padded to the block size."""
+    leftover = src_size % 8
+    pad = leftover if leftover > 0 else 8
+    return src_size + 8 - pad
+
+  def __unpadded_size(src: bytes):
+    """Returns original payload size and the size of block data of an encrypted buffer."""
     src_size = len(src)
     org_size = src[src_size - 2] + src[src_size - 1] * 16
     offset = (src_size - 2) % 8
     pad = offset if offset > 0 else 8
-    size = src_size + 6 - pad
-    buf = src[:size]
-    ints = utils.read_as_u32_list(buf)
+    return org_size, src_size + 6 - pad
+
+  def __ecb(self, buf: bytearray | memoryview, decrypt: bool):
+    """Runs the cipher over all blocks of the buffer, in place."""
+    if HAS_NUMPY and len(buf) >= 8 * VECTORIZE_MIN_BLOCKS:
+      self.__ecb_numpy(buf, decrypt)
+      return
 
+    fmt = f'<{len(buf) // 4}I'
+    ints = list(struct.unpack_from(fmt, buf))
+    op = self.bf.decrypt if decrypt else self.bf.encrypt
     for i in range(0, len(ints), 2):
-      l, r = self.bf.decrypt(ints[i], ints[i+1])
-      ints[i] = l
-      ints[i+1] = r
-    
-    buf = utils.write_u32_list(ints)[:org_size]
-    return buf
+      ints[i], ints[i+1] = op(ints[i], ints[i+1])
+    struct.pack_into(fmt, buf, 0, *ints)
+
+  def __ecb_numpy(self, buf: bytearray | memoryview, decrypt: bool):
+    """Vectorized `__ecb`, each Feistel round is applied to all blocks at once."""
+    import numpy as np
+    if self.__tables is None:
+      P = np.array(self.bf.P, dtype=np.uint32)
+      S = np.array(self.bf.S, dtype=np.uint32).reshape(4, 256)
+      self.__tables = P, S[0], S[1], S[2], S[3]
+    P, S0, S1, S2, S3 = self.__tables
+    # decryption runs the p-array backwards
+    if decrypt:
+      P = P[::-1]
+
+    blocks = np.frombuffer(buf, dtype='<u4').reshape(-1, 2)
+    xl = blocks[:, 0].astype(np.uint32)
+    xr = blocks[:, 1].astype(np.uint32)
+    for i in range(Blowfish.N):
+      xl ^= P[i]
+      xr ^= ((S0[xl >> 24] + S1[(xl >> 16) & 0xFF]) ^ S2[(xl >> 8) & 0xFF]) + S3[xl & 0xFF]
+      xl, xr = xr, xl
+
+    xl, xr = xr, xl
+    xr ^= P[Blowfish.N]
+    xl ^= P[Blowfish.N + 1]
+    blocks[:, 0] = xl
+    blocks[:, 1] = xr
 
   def keygen(len: int):
     return secrets.token_bytes(len)
+
+@functools.lru_cache(maxsize=CIPHER_CACHE_SIZE)
+def get_cipher(key: bytes) -> Cipher:
+  """Returns a `Cipher` for the key, reusing the key schedule of recently used keys.
+
+  Hit/miss counters are available through `get_cipher.cache_info()`."""
+  return Cipher(key)
+
+def save_schedule(key: bytes, path: str):
+  """Runs the key schedule and saves the result to a snapshot file."""
+  bf = FastBlowfish(key)
+  with open(path, 'wb') as file:
+    file.write(SCHEDULE_FORMAT.pack(hashlib.sha256(key).digest(), *bf.P, *bf.S))
+
+def load_schedule(key: bytes, path: str, engine: type[Blowfish | FastBlowfish] = FastBlowfish):
+  """Loads a key schedule snapshot of the key. Returns `None` if the file is missing or was generated for another key."""
+  try:
+    with open(path, 'rb') as file:
+      data = file.read()
+  except FileNotFoundError:
+    return None
+  if len(data) != SCHEDULE_FORMAT.size:
+    return None
+  digest, *words = SCHEDULE_FORMAT.unpack(data)
+  if digest != hashlib.sha256(key).digest():
+    return None
+  return engine.from_schedule(words[:Blowfish.N + 2], words[Blowfish.N + 2:])
@@ -1,4 +1,4 @@
-import utils
+import os, utils
 from enum import Enum
 from blowfish import Cipher
 from data import List, Bin
@@ -23,7 +23,13 @@ class REQUEST_TYPE(Enum):
   DISCONNECT_USER = 6
   STILL_ALIVE = 7
 
-BLOWFISH = Cipher(bytes("SKJDHF$0maoijfn4i8$aJdnv1jaldifar93-AS_dfo;hjhC4jhflasnF3fnd", 'utf8'))
+BLOWFISH_KEY = bytes("SKJDHF$0maoijfn4i8$aJdnv1jaldifar93-AS_dfo;hjhC4jhflasnF3fnd", 'utf8')
+"""Static Blowfish key for CD-Key service."""
+
+BLOWFISH_SNAPSHOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schedules', 'cdkey.bin')
+"""Precomputed key schedule of `BLOWFISH_KEY`, see `bfschedule.py`."""
+
+BLOWFISH = Cipher(BLOWFISH_KEY, snapshot=BLOWFISH_SNAPSHOT)
 
 class CDKeyMessage:
   def __init__(self, bts: bytes):
@@ -54,10 +60,7 @@ class Response:
     """Serializes the response into a CDKeyMessage buffer."""
     buf = bytearray()
     buf.append(self.type)
-    dl = bytearray(bytes(self.dl))
-    dl.pop(0)
-    dl.pop()
-    dl = BLOWFISH.encrypt(bytes(dl))
+    dl = BLOWFISH.encrypt(self.dl.to_buf())
     self.size = len(dl)
     buf.extend(utils.write_u32_be(self.size))
     buf.extend(dl)
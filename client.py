@@ -1,4 +1,21 @@
-import rsa, socket, typing
+import blowfish, rsa, socket, threading, typing
+
+SENDMSG_MAX_BUFFERS = 64
+"""Max number of queued buffers passed to a single `sendmsg`, more are joined first."""
+
+SEND_STATS = {
+  "messages": 0,
+  "syscalls": 0
+}
+"""Messages queued and send calls made by all TCP clients."""
+
+SEND_STATS_LOCK = threading.Lock()
+"""Guards `SEND_STATS`, clients flush from many threads."""
+
+def send_stats():
+  """Returns `SEND_STATS` with the number of send calls saved by coalescing."""
+  with SEND_STATS_LOCK:
+    return SEND_STATS | {"saved": SEND_STATS["messages"] - SEND_STATS["syscalls"]}
 
 class TcpClient:
   """Connected game client."""
@@ -10,7 +27,36 @@ class TcpClient:
     self.sv_privkey: rsa.PrivateKey = None
     self.game_bf_key: bytes = None
     self.sv_bf_key: bytes = None
+    self.sv_cipher: blowfish.Cipher = None
+    """Cipher for `sv_bf_key`, built once per session."""
     self.username: str = None
+    self.out: list[bytes] = []
+    """Messages queued until the next `flush`."""
+
+  def send(self, data: bytes | memoryview):
+    """Queues a message, sent on the next `flush`."""
+    self.out.append(bytes(data) if isinstance(data, memoryview) else data)
+
+  def flush(self):
+    """Sends all queued messages at once, with scatter-gather I/O if available."""
+    bufs = self.out
+    if not bufs:
+      return
+    self.out = []
+    with SEND_STATS_LOCK:
+      SEND_STATS["messages"] += len(bufs)
+      SEND_STATS["syscalls"] += 1
+    if len(bufs) == 1:
+      self.conn.sendall(bufs[0])
+    elif not hasattr(self.conn, "sendmsg") or len(bufs) > SENDMSG_MAX_BUFFERS:
+      self.conn.sendall(b''.join(bufs))
+    else:
+      sent = self.conn.sendmsg(bufs)
+      if sent < sum(len(buf) for buf in bufs):
+        # rest of a partial write
+        with SEND_STATS_LOCK:
+          SEND_STATS["syscalls"] += 1
+        self.conn.sendall(b''.join(bufs)[sent:])
 
 class UdpClient:
   """Connected game client."""
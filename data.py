@@ -1,6 +1,10 @@
 from abc import ABC, abstractmethod
+from collections.abc import Sequence
 from enum import Enum
 
+LONG_SIZE = 4
+"""Size of an encoded `clDataLong` value (big endian, signed) in bytes."""
+
 class DATA_TYPE(Enum):
   """Serializable data type."""
   STR = 1,
@@ -38,20 +42,17 @@ class String(Data):
     return self.string
   
   def __bytes__(self):
-    bts = bytearray([0x73])
-    bts.extend(bytes(self.string, 'utf8'))
-    bts.append(0x00)
+    bts = bytearray()
+    Encoder.write_str(bts, self.string)
     return bytes(bts)
     
   def from_buf(buf: bytearray):
-    result = String()
     if buf[0] != 0x73: # delimiter
       return None
-    buf.pop(0) # s
-    while buf[0] != 0x00 and len(buf) > 1:
-      result.string += chr(buf.pop(0))
-    buf.pop(0) # \0
-    return result
+    with Decoder(buf) as decoder:
+      string, pos = decoder.read_str(0)
+    Decoder.consume(buf, pos)
+    return String(string)
 
 class List(Data):
   """`clDataList` implementation."""
@@ -60,65 +61,44 @@ class List(Data):
     self.lst = lst
 
   def __str__(self):
-    return str(self.lst)
+    # lazy payloads are shown without decoding them
+    if isinstance(self.lst, LazyList):
+      return repr(self.lst)
+    return str(materialize(self.lst))
   
   def __bytes__(self):
-    bts = bytearray([0x5B])
-    for data in self.lst:
-      match str(type(data)):
-        case "<class 'str'>":
-          bts.extend(bytes(String(data)))
-        case "<class 'bytes'>":
-          bts.extend(bytes(Bin(data)))
-        case "<class 'list'>":
-          bts.extend(bytes(List(data)))
-        case "<class 'int'>":
-          raise NotImplementedError('Long type serialization not implemented yet')
-        case _:
-          raise BufferError(f'Unsupported type {type(data)} serialized in list')
-    bts.append(0x5D)
+    bts = bytearray()
+    Encoder.write_list(bts, self.lst)
     return bytes(bts)
   
   def to_buf(self, outer = True):
-    """Serialize list."""
-    result = bytearray(bytes(self))
-    if not outer:
-      return bytes(result)
-    # remove outer brackets
-    result.pop(0) 
-    result.pop()
-    return bytes(result)
+    """Serialize list. Outer lists are written without brackets."""
+    bts = bytearray()
+    if outer:
+      Encoder.write_items(bts, self.lst)
+    else:
+      Encoder.write_list(bts, self.lst)
+    return bytes(bts)
   
-  def from_buf(buf: bytearray, outer = True):
-    """Deserialize list."""
-    result = List([])
-    # [
-    if not outer and buf[0] == 0x5B:
-      buf.pop(0)
+  def from_buf(buf: bytearray, outer = True, zero_copy = False, lazy = False):
+    """Deserialize list.
 
-    # ] (empty list)
-    if buf[0] == 0x5D:
-      buf.pop(0)
-      # print(len(result.lst))
-      return result
-    
-    while len(buf) > 1 and buf[0] != 0x5D:
-      match(chr(buf[0])):
-        case 'b':
-          result.lst.append(Bin.from_buf(buf).bts)
-        case 's':
-          result.lst.append(String.from_buf(buf).string)
-        case 'L':
-          raise NotImplementedError('Long type not implemented yet')
-        case '[':
-          result.lst.append(List.from_buf(buf, False).lst)
-        case _:
-          raise BufferError('Corrupted buffer or unknown type delimiter')
-    
-    # ]
-    if not outer and buf[0] == 0x5D:
-      buf.pop(0)
-    return result
+    With `zero_copy`, binary values are read-only `memoryview` slices of `buf` and the buffer is not consumed.
+    With `lazy`, the list is a `LazyList` referencing `buf`, which is not consumed either."""
+    if lazy:
+      decoder = Decoder(buf, zero_copy)
+      start = 1 if not outer and decoder.end > 0 and buf[0] == 0x5B else 0
+      return List(LazyList(decoder, start, decoder.end))
+    with Decoder(buf, zero_copy) as decoder:
+      lst, pos = decoder.read_list(0, outer)
+    if not zero_copy:
+      Decoder.consume(buf, pos)
+    return List(lst)
+
+  def materialize(self):
+    """Replaces zero-copy binary values with owned copies."""
+    self.lst = materialize(self.lst)
+    return self
 
 class Bin(Data):
   """`clDataBin` implementation."""
@@ -130,28 +110,332 @@ class Bin(Data):
     return str(self.bts)
   
   def __bytes__(self):
-    bts = bytearray([0x62])
-    size = len(self.bts)
-    size_bts = bytes([
-      (size >> 24) & 0xFF,
-      (size >> 16) & 0xFF,
-      (size >> 8) & 0xFF,
-      size & 0xFF,
-    ])
-    bts.extend(size_bts)
-    bts.extend(self.bts)
+    bts = bytearray()
+    Encoder.write_bin(bts, self.bts)
     return bytes(bts)
   
   def from_buf(buf: bytearray):
-    result = Bin()
     if buf[0] != 0x62: # delimiter
       return None
-    buf.pop(0) # b
-    size = (buf.pop(0) << 24) + (buf.pop(0) << 16) + (buf.pop(0) << 8) + buf.pop(0)
-    if len(buf) < size:
-      raise BufferError(f'Binary size exceeds the buffer by {size - len(buf)}')
+    with Decoder(buf) as decoder:
+      bts, pos = decoder.read_bin(0)
+    Decoder.consume(buf, pos)
+    return Bin(bts)
+
+class Long(Data):
+  """`clDataLong` implementation."""
+  def __init__(self, value = 0):
+    super().__init__(DATA_TYPE.LONG)
+    self.value = value
+
+  def __str__(self):
+    return str(self.value)
+
+  def __bytes__(self):
     bts = bytearray()
-    for _ in range(size):
-      bts.append(buf.pop(0))
-    result.bts = bytes(bts)
-    return result
+    Encoder.write_long(bts, self.value)
+    return bytes(bts)
+
+  def from_buf(buf: bytearray):
+    if buf[0] != 0x4C: # delimiter
+      return None
+    with Decoder(buf) as decoder:
+      value, pos = decoder.read_long(0)
+    Decoder.consume(buf, pos)
+    return Long(value)
+
+def materialize(data: any):
+  """Returns `data` with `memoryview` values (from zero-copy decoding) copied into `bytes`, recursively for lists."""
+  if isinstance(data, memoryview):
+    return bytes(data)
+  if is_list(data):
+    return [materialize(value) for value in data]
+  return data
+
+def is_list(value: any):
+  """Checks if a decoded value is a list, either eager or lazy."""
+  return isinstance(value, (list, LazyList))
+
+class Decoder:
+  """Cursor-based `clData` decoder.
+
+  Walks the buffer with an integer offset, every `read_*` method takes the offset of an element and returns its value and the offset past it."""
+  def __init__(self, buf: bytes | bytearray, zero_copy = False):
+    self.buf = buf
+    self.view = memoryview(buf).toreadonly()
+    self.end = len(buf)
+    self.zero_copy = zero_copy
+    """Binary values are returned as views of the buffer instead of copies."""
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    # unlocks resizing of bytearray buffers
+    self.view.release()
+
+  def consume(buf: bytes | bytearray, pos: int):
+    """Removes decoded data from the beginning of mutable buffers, like the consuming `from_buf` parsers used to."""
+    if isinstance(buf, bytearray):
+      del buf[:pos]
+
+  def read(self, pos: int):
+    """Reads an element of any type."""
+    match self.buf[pos]:
+      case 0x62: # b
+        return self.read_bin(pos)
+      case 0x73: # s
+        return self.read_str(pos)
+      case 0x4C: # L
+        return self.read_long(pos)
+      case 0x5B: # [
+        return self.read_list(pos, False)
+      case _:
+        raise BufferError('Corrupted buffer or unknown type delimiter')
+
+  def read_str(self, pos: int):
+    """Reads a string. An unterminated string ends 1 byte before the end of the buffer."""
+    start = pos + 1
+    if start >= self.end:
+      raise BufferError('Unterminated string at the end of the buffer')
+    stop = self.buf.find(0, start, self.end - 1)
+    if stop < 0:
+      stop = self.end - 1
+    return str(self.view[start:stop], 'latin-1'), stop + 1
+
+  def read_bin(self, pos: int):
+    """Reads a binary buffer with a BE u32 size."""
+    start = pos + 5
+    if start > self.end:
+      raise BufferError('Binary size exceeds the buffer')
+    size = int.from_bytes(self.view[pos + 1:start], 'big')
+    if self.end - start < size:
+      raise BufferError(f'Binary size exceeds the buffer by {size - (self.end - start)}')
+    value = self.view[start:start + size]
+    return (value if self.zero_copy else bytes(value)), start + size
+
+  def read_long(self, pos: int):
+    """Reads a fixed size BE signed integer."""
+    start = pos + 1
+    stop = start + LONG_SIZE
+    if stop > self.end:
+      raise BufferError('Long size exceeds the buffer')
+    return int.from_bytes(self.view[start:stop], 'big', signed=True), stop
+
+  def read_list(self, pos: int, outer = True):
+    """Reads a list. Outer lists have no brackets."""
+    buf = self.buf
+    end = self.end
+    read = self.read
+    lst = []
+    # [
+    if not outer and buf[pos] == 0x5B:
+      pos += 1
+
+    # ] (empty list)
+    if buf[pos] == 0x5D:
+      return lst, pos + 1
+
+    while end - pos > 1 and buf[pos] != 0x5D:
+      value, pos = read(pos)
+      lst.append(value)
+
+    # ]
+    if not outer and buf[pos] == 0x5D:
+      pos += 1
+    return lst, pos
+
+  def skip(self, pos: int, depth = 0):
+    """Scans over an element without decoding it.
+
+    Returns the offset past the element and a depth of 0 if it's complete, otherwise the offset of its first incomplete part and the list depth there, which resume the scan once more data is available."""
+    buf = self.buf
+    end = self.end
+    while pos < end:
+      match buf[pos]:
+        case 0x62: # b
+          start = pos + 5
+          if start > end:
+            break
+          size = int.from_bytes(self.view[pos + 1:start], 'big')
+          if end - start < size:
+            break
+          pos = start + size
+        case 0x73: # s
+          stop = buf.find(0, pos + 1, end)
+          if stop < 0:
+            break
+          pos = stop + 1
+        case 0x4C: # L
+          if end - pos <= LONG_SIZE:
+            break
+          pos += 1 + LONG_SIZE
+        case 0x5B: # [
+          pos += 1
+          depth += 1
+        case 0x5D: # ]
+          if depth == 0:
+            raise BufferError('List end without a list start')
+          pos += 1
+          depth -= 1
+        case _:
+          raise BufferError('Corrupted buffer or unknown type delimiter')
+      if depth == 0:
+        break
+    return pos, depth
+
+class StreamDecoder:
+  """Incremental decoder of an outer `clData` list received in chunks.
+
+  Only the pending (incomplete) element is kept between chunks."""
+  def __init__(self):
+    self.buf = bytearray()
+    """Pending element data."""
+    self.pos = 0
+    """Resume offset of the pending element scan."""
+    self.depth = 0
+    """List depth at the resume offset."""
+
+  def feed(self, chunk: bytes):
+    """Adds a chunk and returns the list of top-level elements completed by it."""
+    buf = self.buf
+    buf += chunk
+    values = []
+    start = 0
+    try:
+      while start < len(buf):
+        with Decoder(buf) as decoder:
+          pos, depth = decoder.skip(self.pos, self.depth)
+          if depth != 0 or pos == start:
+            self.pos = pos
+            self.depth = depth
+            break
+          # bound the cursor to the element
+          decoder.end = pos
+          value, _ = decoder.read(start)
+        start = self.pos = pos
+        self.depth = 0
+        values.append(value)
+    finally:
+      # drop decoded elements, pending offsets are relative to the buffer start
+      del buf[:start]
+      self.pos -= start
+    return values
+
+  def pending(self):
+    """Returns the number of bytes of an incomplete element."""
+    return len(self.buf)
+
+class LazyList(Sequence):
+  """Read-only list decoding its elements on first access.
+
+  Element offsets are indexed in one scan on construction, nested lists are lazy as well."""
+  def __init__(self, decoder: Decoder, start: int, end: int):
+    self.decoder = decoder
+    """Decoder referencing the source buffer."""
+    self.start = start
+    """Offset of the first element."""
+    buf = decoder.buf
+    offsets = []
+    pos = start
+    # outer lists end with the buffer, inner ones with a bracket
+    while end - pos > 1 and buf[pos] != 0x5D:
+      offsets.append(pos)
+      pos, depth = decoder.skip(pos)
+      if depth != 0 or pos == offsets[-1]:
+        raise BufferError('Incomplete element in list')
+    offsets.append(pos)
+    self.offsets = offsets
+    """Element offsets, followed by the end offset of the list content."""
+    self.values = [None] * (len(offsets) - 1)
+    """Decoded elements, `None` until accessed."""
+
+  def __len__(self):
+    return len(self.values)
+
+  def __getitem__(self, idx: int | slice):
+    if isinstance(idx, slice):
+      return [self[i] for i in range(*idx.indices(len(self.values)))]
+    value = self.values[idx]
+    if value is None:
+      if idx < 0:
+        idx += len(self.values)
+      pos = self.offsets[idx]
+      if self.decoder.buf[pos] == 0x5B: # [
+        value = LazyList(self.decoder, pos + 1, self.offsets[idx + 1])
+      else:
+        value, _ = self.decoder.read(pos)
+      self.values[idx] = value
+    return value
+
+  def __iter__(self):
+    for idx in range(len(self.values)):
+      yield self[idx]
+
+  def __eq__(self, other: any):
+    if is_list(other):
+      return list(self) == list(other)
+    return NotImplemented
+
+  def __repr__(self):
+    """Shows the decoded elements only, the others as `...`."""
+    values = ", ".join("..." if value is None else repr(bytes(value) if isinstance(value, memoryview) else value) for value in self.values)
+    return f"<LazyList {len(self.values)} elements, {self.offsets[-1] - self.start}B: [{values}]>"
+
+  def raw(self):
+    """Returns the encoded elements, without brackets."""
+    return self.decoder.view[self.start:self.offsets[-1]]
+
+class Encoder:
+  """Single-buffer `clData` serializer.
+
+  Every `write_*` function appends an element to the shared output buffer, nested lists are not serialized separately."""
+  def write(out: bytearray, data: any):
+    """Writes an element of any supported type."""
+    writer = Encoder.WRITERS.get(type(data))
+    if writer is None:
+      raise BufferError(f'Unsupported type {type(data)} serialized in list')
+    writer(out, data)
+
+  def write_str(out: bytearray, string: str):
+    out.append(0x73)
+    out += string.encode('utf8')
+    out.append(0x00)
+
+  def write_bin(out: bytearray, bts: bytes | memoryview):
+    out.append(0x62)
+    out += len(bts).to_bytes(4, 'big')
+    out += bts
+
+  def write_long(out: bytearray, value: int):
+    out.append(0x4C)
+    out += value.to_bytes(LONG_SIZE, 'big', signed=True)
+
+  def write_list(out: bytearray, lst: list):
+    out.append(0x5B)
+    Encoder.write_items(out, lst)
+    out.append(0x5D)
+
+  def write_items(out: bytearray, lst: list):
+    """Writes list elements without brackets."""
+    if type(lst) is LazyList:
+      # undecoded elements are copied as-is
+      out += lst.raw()
+      return
+    writers = Encoder.WRITERS
+    for data in lst:
+      writer = writers.get(type(data))
+      if writer is None:
+        Encoder.write(out, data)
+      else:
+        writer(out, data)
+
+  WRITERS = {
+    str: write_str,
+    bytes: write_bin,
+    memoryview: write_bin,
+    int: write_long,
+    list: write_list,
+    LazyList: write_list
+  }
+  """Serializers by element type."""
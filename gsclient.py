@@ -0,0 +1,29 @@
+import asyncio, socket
+import gsm
+from data import List
+
+def request(msg_type: gsm.MESSAGE_TYPE, lst: list):
+  """Serializes a `PROPERTY.GS` message as sent by a game client."""
+  header = gsm.GSMessageHeader.from_params(gsm.PROPERTY.GS, 1, msg_type, gsm.SENDER_RECEIVER.P, gsm.SENDER_RECEIVER.S)
+  return bytes(gsm.GSMNotification(gsm.Message(None, header=header, dl=List(lst))))
+
+async def read_message(reader: asyncio.StreamReader):
+  """Reads the next `PROPERTY.GS` message from a stream."""
+  header = await reader.readexactly(gsm.GSMSG_HEADER_SIZE)
+  size = gsm.GSMessageHeader(header).size
+  return gsm.Message(None, in_buf=header + await reader.readexactly(size - gsm.GSMSG_HEADER_SIZE))
+
+def recv_exactly(sock: socket.socket, size: int):
+  buf = bytearray()
+  while len(buf) < size:
+    data = sock.recv(size - len(buf))
+    if not data:
+      raise ConnectionError("Disconnected.")
+    buf += data
+  return bytes(buf)
+
+def recv_message(sock: socket.socket):
+  """Receives the next `PROPERTY.GS` message from a blocking socket."""
+  header = recv_exactly(sock, gsm.GSMSG_HEADER_SIZE)
+  size = gsm.GSMessageHeader(header).size
+  return gsm.Message(None, in_buf=header + recv_exactly(sock, size - gsm.GSMSG_HEADER_SIZE))
@@ -1,14 +1,26 @@
 from enum import Enum
-import blowfish, gsxor, pkc, client, utils
+import asyncio, blowfish, concurrent.futures, gsxor, pkc, client, schema, socket, struct, time, utils
 from client import TcpClient
-from data import List
+from data import List, is_list, materialize
 from group import Lobby, Room, RoomCreateData, ROOM_UPDATE_FLAGS
-from typing import Self
+from typing import Callable, NamedTuple, Self
 from h5_data import H5_Room, H5_Serializer
 
 GSMSG_HEADER_SIZE = 6
 """Length of `GSMessageHeader` in bytes."""
 
+TEMPLATE_CACHE_SIZE = 256
+"""Max number of cached wire templates of constant responses."""
+
+TEMPLATES: dict[tuple, bytes] = {}
+"""Serialized and encrypted constant responses by template key, see `GSMResponse.template`."""
+
+FRAMER_BUFFER_SIZE = 4096
+"""Initial receive buffer size of `Framer`, grown for bigger messages."""
+
+MAX_MESSAGE_SIZE = 0x10000
+"""Max accepted GS message size in bytes, bigger ones are rejected before their buffer is allocated."""
+
 class MESSAGE_TYPE(Enum):
   """Type of `GSMessage` or its result."""
   NEWUSERREQUEST = 1
@@ -199,6 +211,12 @@ class NAT_MSG(Enum):
   PORT_ID = 2
   ADDRESS = 3
 
+LAZY_MESSAGE_TYPES = {
+  MESSAGE_TYPE.PROXY_HANDLER,
+  MESSAGE_TYPE.LOBBY_MSG
+}
+"""Message types decoded into a `LazyList`, their handlers only read a few fields of large payloads."""
+
 class SENDER_RECEIVER(Enum):
   """GSMessage sender/receiver types."""
   R = 1
@@ -224,48 +242,76 @@ class PROPERTY(Enum):
   GAME = 1
   GS_ENCRYPT = 2
 
+def lookup_table(enum: type[Enum], key):
+  """Returns a 256-entry tuple of enum members by header byte, `None` for invalid values."""
+  values = {member.value for member in enum}
+  return tuple(enum(key(byte)) if key(byte) in values else None for byte in range(256))
+
+HEADER_FORMAT = struct.Struct('>IBB')
+"""`GSMessageHeader` layout: 24-bit size with property/priority byte, type, sender/receiver."""
+
+PROPERTIES = lookup_table(PROPERTY, lambda byte: byte >> 6)
+"""`PROPERTY` by property/priority byte."""
+
+MESSAGE_TYPES = lookup_table(MESSAGE_TYPE, lambda byte: byte)
+"""`MESSAGE_TYPE` by type byte."""
+
+SENDERS = lookup_table(SENDER_RECEIVER, lambda byte: byte >> 4)
+"""Sender `SENDER_RECEIVER` by sender/receiver byte."""
+
+RECEIVERS = lookup_table(SENDER_RECEIVER, lambda byte: byte & 0x0F)
+"""Receiver `SENDER_RECEIVER` by sender/receiver byte."""
+
 class GSMessageHeader:
   """Header for `GSMessage` and `GSEncryptMessage`."""
-  def __init__(self, bts: bytes):
-    self.size = (bts[0] << 16) + (bts[1] << 8) + bts[2]
-    self.property = PROPERTY(bts[3] >> 6)
-    self.priority = bts[3] & 0x3F
-    self.type = MESSAGE_TYPE(bts[4])
-    self.sender = SENDER_RECEIVER(bts[5] >> 4)
-    self.receiver = SENDER_RECEIVER(bts[5] & 0x0F)
+  __slots__ = ('size', 'property', 'priority', 'type', 'sender', 'receiver')
+
+  def __init__(self, bts: bytes, offset = 0):
+    size_pp, msg_type, sr = HEADER_FORMAT.unpack_from(bts, offset)
+    pp = size_pp & 0xFF
+    self.size = size_pp >> 8
+    self.property = PROPERTIES[pp]
+    self.priority = pp & 0x3F
+    self.type = MESSAGE_TYPES[msg_type]
+    self.sender = SENDERS[sr]
+    self.receiver = RECEIVERS[sr]
+    if self.property is None or self.type is None or self.sender is None or self.receiver is None:
+      raise ValueError(f"Invalid GS message header {bytes(bts[offset:offset + GSMSG_HEADER_SIZE]).hex()}.")
 
   def __bytes__(self):
     result = bytearray(GSMSG_HEADER_SIZE)
-    size = utils.write_u24_be(self.size)
-    result[0] = size[0]
-    result[1] = size[1]
-    result[2] = size[2]
-    result[3] |= self.property.value << 6
-    result[3] |= self.priority & 0x3F
-    result[4] = self.type.value
-    result[5] &= 0xF
-    result[5] |= 0x10 * self.sender.value
-    result[5] &= 0xF0
-    result[5] |= self.receiver.value & 0xF
+    self.write_into(result)
     return bytes(result)
-  
+
+  def write_into(self, out: bytearray | memoryview, offset = 0):
+    """Writes the header into the buffer at the given offset."""
+    pp = (self.property.value << 6) | (self.priority & 0x3F)
+    sr = ((self.sender.value & 0xF) << 4) | (self.receiver.value & 0xF)
+    HEADER_FORMAT.pack_into(out, offset, (self.size << 8) | pp, self.type.value, sr)
+
   @classmethod
   def from_params(cls: Self, prop: PROPERTY, priority: int, msg_type: MESSAGE_TYPE, sender: SENDER_RECEIVER, receiver: SENDER_RECEIVER) -> Self:
-    pp = (prop.value << 6) | (priority & 0x3F)
-    sr = (sender.value << 4) | receiver.value
+    header = cls.__new__(cls)
     # size is calculated after payload encryption
-    bts = bytes([0, 0, 0, pp, msg_type.value & 0xFF, sr])
-    return cls(bts)
+    header.size = 0
+    header.property = prop
+    header.priority = priority & 0x3F
+    header.type = msg_type
+    header.sender = sender
+    header.receiver = receiver
+    return header
 
 class Message:
   """Common message implementation."""
-  def __init__(self, bf_key: bytes, in_buf: bytes = None, header: GSMessageHeader = None, dl: List = None):
+  def __init__(self, bf_key: bytes | blowfish.Cipher, in_buf: bytes = None, header: GSMessageHeader = None, dl: List = None):
     if header is None and in_buf is None:
       raise ValueError("Insufficient parameters for message construction.")
-    self.header = header if header is not None else GSMessageHeader(in_buf[:GSMSG_HEADER_SIZE])
+    self.header = header if header is not None else GSMessageHeader(in_buf)
     """GSM protocol header."""
     self.dl = dl
     """DataList with payload data."""
+    self.args = None
+    """Payload record, extracted on demand by `lobby_args`."""
     # client request
     if in_buf is not None:
       self.decrypt(in_buf, bf_key)
@@ -273,38 +319,280 @@ class Message:
     elif header is None or dl is None:
       raise ValueError("Insufficient parameters for message construction.")
 
-  def decrypt(self, bts: bytes, bf_key: bytes):
+  def decrypt(self, bts: bytes, bf_key: bytes | blowfish.Cipher):
     match self.header.property:
       case PROPERTY.GS:
         if self.header.size > GSMSG_HEADER_SIZE:
           dec = gsxor.decrypt(bts[GSMSG_HEADER_SIZE:self.header.size])
-          self.dl: List = List.from_buf(bytearray(dec))
+          self.dl: List = List.from_buf(dec, zero_copy=True, lazy=self.header.type in LAZY_MESSAGE_TYPES)
       case PROPERTY.GAME:
         pass
       case PROPERTY.GS_ENCRYPT:
         if bf_key is None:
           raise ValueError("Attempting blowfish decryption without a key.")
-        dec = blowfish.Cipher(bf_key).decrypt(bts[GSMSG_HEADER_SIZE:self.header.size])
-        self.dl: List = List.from_buf(bytearray(dec))
+        # session ciphers are passed as-is, raw keys go through the key schedule cache
+        cipher = bf_key if isinstance(bf_key, blowfish.Cipher) else blowfish.get_cipher(bf_key)
+        dec = cipher.decrypt(bts[GSMSG_HEADER_SIZE:self.header.size])
+        self.dl: List = List.from_buf(dec, zero_copy=True, lazy=self.header.type in LAZY_MESSAGE_TYPES)
 
   def __repr__(self):
     payload = self.dl or ""
     return f"<{self.header.type.name}\t{self.header.property.name}\t{self.header.sender.name}->{self.header.receiver.name}\t{self.header.size}B>\n{payload}"
 
-class GSMessageBundle:
-  """Packet containing 2 or more GS messages."""
-  def __init__(self, first: Message, data: bytes, clt: client.TcpClient):
-    self.msgs = [first]
-    while len(data) > 0:
-      msg = Message(clt.sv_bf_key, in_buf=data)
-      self.msgs.append(msg)
-      data = data[msg.header.size:]
-
-  def __repr__(self):
-    result = f"<BUNDLE: {self.msgs[0].header.type.name}"
-    for i in range(1, len(self.msgs), 1):
-      result += f" + {self.msgs[i].header.type.name}"
-    return result + ">"
+class JoinServerArgs(NamedTuple):
+  """`LOBBY_MSG.JOIN_SERVER` payload."""
+  server_id: str
+  rest: list
+
+class GroupInfoGetArgs(NamedTuple):
+  """`LOBBY_MSG.GROUP_INFO_GET` payload."""
+  group_id: str
+  rest: list
+
+class CreateRoomArgs(NamedTuple):
+  """`LOBBY_MSG.CREATE_ROOM` payload, see `RoomCreateData`."""
+  parent_id: int
+  room_name: str
+  game_title: str
+  event_id: int
+  max_players: int
+  max_visitors: int
+  group_info: bytes
+  room_password: str
+  game_version: str
+  gs_version: str
+  alt_group_info: bytes
+
+class LobbyLoginArgs(NamedTuple):
+  """`LOBBY_MSG.LOGIN` payload."""
+  game_name: str
+  rest: list
+
+class JoinLobbyArgs(NamedTuple):
+  """`LOBBY_MSG.JOIN_LOBBY` payload."""
+  group_id: str
+  rest: list
+
+class JoinRoomArgs(NamedTuple):
+  """`LOBBY_MSG.JOIN_ROOM` payload."""
+  group_id: int
+  room_password: str
+  flags: int
+  """LSM (iconfig, group flags)."""
+  is_visitor: str
+  gs_version: str
+
+class GroupConfigUpdateArgs(NamedTuple):
+  """`LOBBY_MSG.GROUP_CONFIG_UPDATE_RES` payload, `rest` values are given by `ROOM_UPDATE_FLAGS`."""
+  group_id: int
+  flags: int
+  rest: list
+
+class GameConnectedArgs(NamedTuple):
+  """`LOBBY_MSG.GAME_CONNECTED` payload."""
+  group_id: int
+  rest: list
+
+class ChangeRequestedLobbiesArgs(NamedTuple):
+  """`LOBBY_MSG.CHANGE_REQUESTED_LOBBIES` payload."""
+  game_name: str
+  rest: list
+
+LOBBY_EXTRACTORS = {
+  LOBBY_MSG.JOIN_SERVER: schema.extractor(JoinServerArgs),
+  LOBBY_MSG.GROUP_INFO_GET: schema.extractor(GroupInfoGetArgs),
+  LOBBY_MSG.CREATE_ROOM: schema.extractor(CreateRoomArgs),
+  LOBBY_MSG.LOGIN: schema.extractor(LobbyLoginArgs),
+  LOBBY_MSG.JOIN_LOBBY: schema.extractor(JoinLobbyArgs),
+  LOBBY_MSG.JOIN_ROOM: schema.extractor(JoinRoomArgs),
+  LOBBY_MSG.GROUP_CONFIG_UPDATE_RES: schema.extractor(GroupConfigUpdateArgs),
+  LOBBY_MSG.GAME_CONNECTED: schema.extractor(GameConnectedArgs),
+  LOBBY_MSG.CHANGE_REQUESTED_LOBBIES: schema.extractor(ChangeRequestedLobbiesArgs)
+}
+"""Payload extractors by `LOBBY_MSG` subtype."""
+
+def lobby_args(req: Message):
+  """Returns the payload record of a `LOBBY_MSG` request, extracted once per message."""
+  if req.args is None:
+    subtype = LOBBY_MSG(int(req.dl.lst[0]))
+    extract = LOBBY_EXTRACTORS.get(subtype)
+    if extract is None:
+      raise NotImplementedError(f"No payload layout for {subtype.name} lobby messages.")
+    req.args = extract(req.dl.lst[1])
+  return req.args
+
+class Framer:
+  """Cuts GS messages from a TCP stream by the 24-bit size of their header.
+
+  Data is received into a preallocated buffer, pending bytes are moved to its start before the next read.
+  Frames are `memoryview`s of the buffer, valid until the next `recv` or `feed`."""
+  def __init__(self, size = FRAMER_BUFFER_SIZE, max_size = MAX_MESSAGE_SIZE):
+    self.max_size = max_size
+    """Max accepted message size."""
+    self.buf = bytearray(size)
+    self.view = memoryview(self.buf)
+    self.start = 0
+    """Offset of the first unprocessed byte."""
+    self.end = 0
+    """Offset past the last received byte."""
+    self.missing = 0
+    """Number of bytes missing from the pending message."""
+
+  def recv(self, conn: socket.socket):
+    """Receives data from the socket into the buffer. Returns the number of bytes received, 0 on disconnection."""
+    self.compact(self.missing)
+    size = conn.recv_into(self.view[self.end:])
+    self.end += size
+    return size
+
+  def feed(self, data: bytes):
+    """Adds data received by other means, like asyncio protocols."""
+    self.compact(len(data))
+    self.view[self.end:self.end + len(data)] = data
+    self.end += len(data)
+
+  def frames(self):
+    """Yields complete messages from the buffer."""
+    view = self.view
+    self.missing = 0
+    while self.end - self.start >= GSMSG_HEADER_SIZE:
+      start = self.start
+      size = (view[start] << 16) | (view[start + 1] << 8) | view[start + 2]
+      if size < GSMSG_HEADER_SIZE or size > self.max_size:
+        raise BufferError(f"Invalid GS message size {size}.")
+      if self.end - start < size:
+        # room is made for the rest on the next read
+        self.missing = size - (self.end - start)
+        return
+      self.start = start + size
+      yield view[start:start + size]
+
+  def compact(self, extra = 0):
+    """Moves pending data to the start of the buffer, growing it if `extra` bytes don't fit after the data."""
+    pending = self.end - self.start
+    if pending + extra > len(self.buf):
+      buf = bytearray(max(pending + extra, 2 * len(self.buf)))
+      buf[:pending] = self.view[self.start:self.end]
+      self.buf = buf
+      self.view = memoryview(buf)
+    elif self.start > 0:
+      self.view[:pending] = self.view[self.start:self.end]
+    self.start = 0
+    self.end = pending
+
+class Registry:
+  """Request handlers of a GS service, dispatched by message type and `LOBBY_MSG` subtype.
+
+  Handlers take the client and the request and return a response or `None`."""
+  def __init__(self):
+    self.handlers: dict[tuple[MESSAGE_TYPE, LOBBY_MSG], Callable] = {}
+    self.timings: dict[tuple[MESSAGE_TYPE, LOBBY_MSG], utils.OpTimer] = {}
+    """Call count and cumulative time of each handler."""
+    self.offloaded: set[tuple[MESSAGE_TYPE, LOBBY_MSG]] = set()
+    """Handlers that block, run outside of event loops."""
+    self.coroutines: dict[tuple[MESSAGE_TYPE, LOBBY_MSG], Callable] = {}
+    """Coroutine variants of handlers, awaited by event loops instead."""
+
+  def add(self, msg_type: MESSAGE_TYPE, handler: Callable, subtype: LOBBY_MSG = None, offload = False, coroutine: Callable = None):
+    """Registers a handler for the message type, and the subtype of `LOBBY_MSG` messages.
+
+    Handlers waiting on other threads or processes are marked with `offload`, or given a `coroutine` variant that awaits them."""
+    key = (msg_type, subtype)
+    if key in self.handlers:
+      raise ValueError(f"Handler for {Registry.key_name(key)} registered twice.")
+    self.handlers[key] = handler
+    self.timings[key] = utils.OpTimer()
+    if offload:
+      self.offloaded.add(key)
+    if coroutine is not None:
+      self.coroutines[key] = coroutine
+
+  def handler(self, msg_type: MESSAGE_TYPE, subtype: LOBBY_MSG = None, offload = False, coroutine: Callable = None):
+    """Decorator registering the function as a handler, see `add`."""
+    def register(handler: Callable):
+      self.add(msg_type, handler, subtype, offload, coroutine)
+      return handler
+    return register
+
+  def key(req: Message):
+    """Returns the handler key of the request."""
+    msg_type = req.header.type
+    subtype = LOBBY_MSG(int(req.dl.lst[0])) if msg_type is MESSAGE_TYPE.LOBBY_MSG else None
+    return msg_type, subtype
+
+  def offloads(self, req: Message):
+    """Checks if the handler of the request blocks."""
+    return Registry.key(req) in self.offloaded
+
+  def awaits(self, req: Message):
+    """Checks if the handler of the request has a coroutine variant."""
+    return Registry.key(req) in self.coroutines
+
+  async def dispatch_async(self, clt: TcpClient, req: Message):
+    """Awaits the coroutine variant of the handler of the request and returns its response."""
+    key = Registry.key(req)
+    start = time.perf_counter()
+    try:
+      return await self.coroutines[key](clt, req)
+    finally:
+      self.timings[key].record(time.perf_counter() - start)
+
+  def dispatch(self, clt: TcpClient, req: Message):
+    """Runs the handler of the request and returns its response."""
+    key = Registry.key(req)
+    msg_type, subtype = key
+    handler = self.handlers.get(key)
+    if handler is None:
+      if subtype is not None:
+        raise NotImplementedError(f"No request handler for {subtype.name} lobby message.")
+      raise NotImplementedError(f"No request handler for {msg_type.name} messages.")
+    start = time.perf_counter()
+    try:
+      return handler(clt, req)
+    finally:
+      self.timings[key].record(time.perf_counter() - start)
+
+  def stats(self):
+    """Returns handler timings by message name, for handlers that were called."""
+    return {Registry.key_name(key): timer for key, timer in self.timings.items() if timer.calls > 0}
+
+  def key_name(key: tuple[MESSAGE_TYPE, LOBBY_MSG]):
+    msg_type, subtype = key
+    return msg_type.name if subtype is None else f"{msg_type.name}.{subtype.name}"
+
+def handle_still_alive(clt: TcpClient, req: Message):
+  """Keep-alive messages have no response."""
+  return None
+
+def start_key_exchange(clt: TcpClient, req: Message) -> concurrent.futures.Future:
+  """Starts the RSA operation of a `KEY_EXCHANGE` request in the process pool, see `finish_key_exchange`."""
+  match req.dl.lst[0]:
+    case '1':
+      clt.game_pubkey = pkc.RsaPublicKey.from_buf(req.dl.lst[1][2]).to_pubkey()
+      # pre-generated keypair
+      return pkc.KEY_POOL.pop_async()
+    case '2':
+      enc_bf_key = bytes(req.dl.lst[1][2])
+      return pkc.decrypt_async(enc_bf_key, clt.sv_privkey)
+    case _:
+      raise BufferError(f'Unknown reqId ({req.dl.lst[0]}) for a {req.header.type.name} message.')
+
+def finish_key_exchange(clt: TcpClient, req: Message, result):
+  """Stores the result of the RSA operation of a `KEY_EXCHANGE` request and returns the response."""
+  if req.dl.lst[0] == '1':
+    clt.sv_pubkey, clt.sv_privkey = result
+  else:
+    clt.game_bf_key = result
+  return KeyExchangeResponse(req, clt)
+
+def handle_key_exchange(clt: TcpClient, req: Message):
+  """Handler for `KEY_EXCHANGE` messages, shared by the services."""
+  return finish_key_exchange(clt, req, start_key_exchange(clt, req).result())
+
+async def handle_key_exchange_async(clt: TcpClient, req: Message):
+  """`handle_key_exchange` for event loops, awaits the process pool without blocking a thread."""
+  future = start_key_exchange(clt, req)
+  return finish_key_exchange(clt, req, await asyncio.wrap_future(future))
 
 class GSMResponse:
   """Base class for GS message responses."""
@@ -312,24 +600,38 @@ class GSMResponse:
     self.header = req.header
     self.header.sender, self.header.receiver = self.header.receiver, self.header.sender
     self.dl: List = None
+    self.template: tuple = None
+    """Key of responses with a constant payload, their wire message is built once and only the header is rewritten."""
 
   def __bytes__(self):
-    bts = bytearray()
+    if self.template is None:
+      return self.__serialize()
+    wire = TEMPLATES.get(self.template)
+    if wire is None:
+      wire = self.__serialize()
+      if len(TEMPLATES) < TEMPLATE_CACHE_SIZE:
+        TEMPLATES[self.template] = wire
+    # priority and sender/receiver come from the request
+    bts = bytearray(wire)
+    self.header.size = len(wire)
+    self.header.write_into(bts)
+    return bytes(bts)
+
+  def __serialize(self):
+    bts = bytearray(GSMSG_HEADER_SIZE)
     dl = None
     if self.dl is not None:
-      dl = bytearray(bytes(self.dl))
-      dl.pop(0)
-      dl.pop()
+      dl = self.dl.to_buf()
       match self.header.property:
         case PROPERTY.GS:
-          dl = gsxor.encrypt(bytes(dl))
+          dl = gsxor.encrypt(dl)
           self.header.size = GSMSG_HEADER_SIZE + len(dl)
         case PROPERTY.GS_ENCRYPT:
           raise NotImplementedError("GS_ENCRYPT message serialization unsupported.")
 
-    bts.extend(bytes(self.header))
+    self.header.write_into(bts)
     if dl is not None:
-      bts.extend(dl)
+      bts += dl
     return bytes(bts)
 
   def __repr__(self):
@@ -343,22 +645,20 @@ class GSMNotification:
     self.dl = notif.dl
 
   def __bytes__(self):
-    bts = bytearray()
+    bts = bytearray(GSMSG_HEADER_SIZE)
     dl = None
     if self.dl is not None:
-      dl = bytearray(bytes(self.dl))
-      dl.pop(0)
-      dl.pop()
+      dl = self.dl.to_buf()
       match self.header.property:
         case PROPERTY.GS:
-          dl = gsxor.encrypt(bytes(dl))
+          dl = gsxor.encrypt(dl)
           self.header.size = GSMSG_HEADER_SIZE + len(dl)
         case PROPERTY.GS_ENCRYPT:
           raise NotImplementedError("GS_ENCRYPT message serialization unsupported.")
 
-    bts.extend(bytes(self.header))
+    self.header.write_into(bts)
     if dl is not None:
-      bts.extend(dl)
+      bts += dl
     return bytes(bts)
 
   def __repr__(self):
@@ -366,8 +666,9 @@ class GSMNotification:
     return f"<{self.header.type.name} NOTIF\t{self.header.property.name}\t{self.header.sender.name}->{self.header.receiver.name}\t{self.header.size}B>\n{payload}"
   
   def send_tcp(self, clt: TcpClient):
+    """Queues the notification, sent with the responses to the current requests."""
     # serialization + encryption
-    clt.conn.sendall(bytes(self))
+    clt.send(bytes(self))
 
 class KeyExchangeResponse(GSMResponse):
   """Response to `KEY_EXCHANGE` messages."""
@@ -387,6 +688,7 @@ class KeyExchangeResponse(GSMResponse):
         self.dl = List(['2', ['1']])
         bf_key = blowfish.Cipher.keygen(16)
         clt.sv_bf_key = bf_key
+        clt.sv_cipher = blowfish.Cipher(bf_key)
         enc_key = pkc.encrypt(bf_key, clt.game_pubkey)
         self.dl.lst[1].append(str(len(enc_key)))
         self.dl.lst[1].append(enc_key)
@@ -405,6 +707,7 @@ class LoginResponse(GSMResponse):
     self.header.type = MESSAGE_TYPE.GSSUCCESS
     msg_id = MESSAGE_TYPE.LOGIN.value
     self.dl = List([msg_id.to_bytes(1, 'little')])
+    self.template = (LoginResponse,)
 
 class JoinWaitModuleResponse(GSMResponse):
   """Response to `JOINWAITMODULE` messages."""
@@ -427,6 +730,7 @@ class LoginWaitModuleResponse(GSMResponse):
     self.header.type = MESSAGE_TYPE.GSSUCCESS
     msg_id = MESSAGE_TYPE.LOGINWAITMODULE.value
     self.dl = List([msg_id.to_bytes(1, 'little')])
+    self.template = (LoginWaitModuleResponse,)
 
 class PlayerInfoResponse(GSMResponse):
   """Response to `PLAYERINFO` messages."""
@@ -451,7 +755,7 @@ class ProxyHandlerResponse(GSMResponse):
     self.header.type = MESSAGE_TYPE.PROXY_HANDLER
     result = str(MESSAGE_TYPE.GSSUCCESS.value)
     subtype = req.dl.lst[0]
-    if str(type(subtype)) == "<class 'list'>":
+    if is_list(subtype):
       self.dl = None
     else:
       match subtype:
@@ -485,6 +789,7 @@ class ProxyLoginResponse(GSMResponse):
     self.header.type = MESSAGE_TYPE.GSSUCCESS
     msg_id = MESSAGE_TYPE.LOGIN.value
     self.dl = List([msg_id.to_bytes(1, 'little'), []])
+    self.template = (ProxyLoginResponse,)
 
 class ProxyJoinWaitModuleResponse(GSMResponse):
   """Response to `JOINWAITMODULE` messages for proxy service."""
@@ -507,6 +812,7 @@ class ProxyLoginWaitModuleResponse(GSMResponse):
     self.header.type = MESSAGE_TYPE.GSSUCCESS
     msg_id = MESSAGE_TYPE.LOGINWAITMODULE.value
     self.dl = List([msg_id.to_bytes(1, 'little'), []])
+    self.template = (ProxyLoginWaitModuleResponse,)
 
 class LoginFriendsResponse(GSMResponse):
   """Response to `LOGINFRIENDS` messages."""
@@ -518,6 +824,7 @@ class LoginFriendsResponse(GSMResponse):
     self.header.type = MESSAGE_TYPE.GSSUCCESS
     msg_id = MESSAGE_TYPE.LOGINFRIENDS.value
     self.dl = List([msg_id.to_bytes(1, 'little')])
+    self.template = (LoginFriendsResponse,)
 
 class LobbyMsgResponse(GSMResponse):
   """Response to `LOBBY_MSG` messages."""
@@ -533,6 +840,7 @@ class LobbyMsgResponse(GSMResponse):
         subtype = str(subtype.value)
         result = str(MESSAGE_TYPE.GSSUCCESS.value)
         self.dl = List([result, [subtype]])
+        self.template = (LobbyMsgResponse, subtype)
       case _:
         raise NotImplementedError(f"Unsupported lobby message subtype {subtype.name}")
 
@@ -563,7 +871,7 @@ class JoinLobbyServerResponse(GSMResponse):
     self.header.type = MESSAGE_TYPE.LOBBY_MSG
     result = str(MESSAGE_TYPE.GSSUCCESS.value)
     subtype = str(LOBBY_MSG.JOIN_SERVER.value)
-    server_id = req.dl.lst[1][0]
+    server_id = lobby_args(req).server_id
     ip = lobby_sv[0]
     port = str(lobby_sv[1])
     self.dl = List([result, [subtype, [server_id, ip, port]]])
@@ -579,6 +887,8 @@ class LobbyServerLoginResponse(GSMResponse):
     result = str(MESSAGE_TYPE.LOBBYSERVERLOGIN.value)
     server_id = req.dl.lst[1]
     self.dl = List([result, [server_id]])
+    if isinstance(server_id, str):
+      self.template = (LobbyServerLoginResponse, server_id)
 
 class JoinLobbyResponse(GSMResponse):
   """Response to `LOBBY_MSG.JOIN_LOBBY` messages."""
@@ -590,7 +900,7 @@ class JoinLobbyResponse(GSMResponse):
     self.header.type = MESSAGE_TYPE.LOBBY_MSG
     result = str(MESSAGE_TYPE.GSSUCCESS.value)
     subtype = str(LOBBY_MSG.JOIN_LOBBY.value)
-    group_id = req.dl.lst[1][0]
+    group_id = lobby_args(req).group_id
     # reason goes after group_id, for failures only
     reason = ""
     self.dl = List([result, [subtype, [group_id]]])
@@ -619,7 +929,7 @@ class GetGroupInfoResponse(GSMResponse):
     self.header.type = MESSAGE_TYPE.LOBBY_MSG
     result = str(MESSAGE_TYPE.GSSUCCESS.value)
     subtype = str(LOBBY_MSG.GROUP_INFO_GET.value)
-    group_id = req.dl.lst[1][0]
+    group_id = lobby_args(req).group_id
     room_id = "0"
     self.dl = List([result, [subtype, [group_id, room_id]]])
 
@@ -633,19 +943,11 @@ class CreateRoomResponse(GSMResponse):
     self.header.type = MESSAGE_TYPE.LOBBY_MSG
     result = str(MESSAGE_TYPE.GSSUCCESS.value)
     subtype = str(LOBBY_MSG.CREATE_ROOM.value)
-    room_data: RoomCreateData = {
-      "parent_id": int(req.dl.lst[1][0]), # parent lobby id
-      "room_name": req.dl.lst[1][1],
-      "game_title": req.dl.lst[1][2],
-      "event_id": int(req.dl.lst[1][3]), # 7 (room type for rooms)
-      "max_players": int(req.dl.lst[1][4]),
-      "max_visitors": int(req.dl.lst[1][5]),
-      "group_info": req.dl.lst[1][6],
-      "room_password": req.dl.lst[1][7],
-      "game_version": req.dl.lst[1][8], # empty
-      "gs_version": req.dl.lst[1][9],
-      "alt_group_info": req.dl.lst[1][10] # empty
-    }
+    args: CreateRoomArgs = lobby_args(req)
+    room_data: RoomCreateData = args._asdict()
+    # kept by the room
+    room_data["group_info"] = materialize(args.group_info)
+    room_data["alt_group_info"] = materialize(args.alt_group_info)
     gs_room = Room(room_data, room_id, master)
     room_info = H5_Serializer().deserialize_roominfo(room_data["group_info"])
     print(room_info.__dict__)
@@ -669,11 +971,7 @@ class JoinRoomResponse(GSMResponse):
     self.header.type = MESSAGE_TYPE.LOBBY_MSG
     result = str(MESSAGE_TYPE.GSSUCCESS.value)
     subtype = str(LOBBY_MSG.JOIN_ROOM.value)
-    group_id = req.dl.lst[1][0]
-    room_pwd = req.dl.lst[1][1]
-    flags = int(req.dl.lst[1][2]) # LSM (group flags)
-    is_visitor = req.dl.lst[1][3]
-    gs_version = req.dl.lst[1][4]
+    group_id = str(lobby_args(req).group_id)
     self.dl = List([result, [subtype, [group_id]]])
 
 class GroupConfigUpdateResultResponse(GSMResponse):
@@ -686,33 +984,35 @@ class GroupConfigUpdateResultResponse(GSMResponse):
     self.header.type = MESSAGE_TYPE.LOBBY_MSG
     result = str(MESSAGE_TYPE.GSSUCCESS.value)
     subtype = str(LOBBY_MSG.GROUP_CONFIG_UPDATE_RES.value)
-    group_id = int(req.dl.lst[1][0])
+    args: GroupConfigUpdateArgs = lobby_args(req)
+    group_id = args.group_id
     # defines the payload structure
-    flags = int(req.dl.lst[1][1])
+    flags = args.flags
+    values = args.rest
     # list iterator
-    idx = 2
+    idx = 0
     if flags & ROOM_UPDATE_FLAGS.DS_FLAGS.value == ROOM_UPDATE_FLAGS.DS_FLAGS.value:
       # see group.DS_ROOM_UPDATE_FLAGS for details
-      ds_flags = int(req.dl.lst[1][idx])
+      ds_flags = int(values[idx])
       idx += 1
     if flags & ROOM_UPDATE_FLAGS.MAX_PLAYERS.value == ROOM_UPDATE_FLAGS.MAX_PLAYERS.value:
-      max_players = int(req.dl.lst[1][idx])
+      max_players = int(values[idx])
       idx += 1
       room.gs_room.max_players = max_players
     if flags & ROOM_UPDATE_FLAGS.MAX_VISITORS.value == ROOM_UPDATE_FLAGS.MAX_VISITORS.value:
-      max_visitors = int(req.dl.lst[1][idx])
+      max_visitors = int(values[idx])
       idx += 1
       room.gs_room.max_visitors = max_visitors
     if flags & ROOM_UPDATE_FLAGS.PASSWORD.value == ROOM_UPDATE_FLAGS.PASSWORD.value:
-      room_pwd = req.dl.lst[1][idx]
+      room_pwd = values[idx]
       idx += 1
       room.gs_room.room_password = room_pwd
     if flags & ROOM_UPDATE_FLAGS.GROUP_INFO.value == ROOM_UPDATE_FLAGS.GROUP_INFO.value:
-      room_info = req.dl.lst[1][idx]
+      room_info = materialize(values[idx])
       idx += 1
       room.gs_room.group_info = room_info
     if flags & ROOM_UPDATE_FLAGS.ALT_GROUP_INFO.value == ROOM_UPDATE_FLAGS.ALT_GROUP_INFO.value:
-      alt_room_info = req.dl.lst[1][idx]
+      alt_room_info = materialize(values[idx])
       idx += 1
       room.gs_room.alt_group_info = alt_room_info
     self.dl = List([result, [subtype, [str(group_id)]]])
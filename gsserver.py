@@ -0,0 +1,122 @@
+import asyncio, traceback
+import client, gsm
+from typing import Callable
+
+QUEUE_HIGH_WATER = 64
+"""Number of received messages waiting for their handlers at which a connection stops reading."""
+
+QUEUE_LOW_WATER = 16
+"""Number of received messages waiting for their handlers at which a paused connection reads again."""
+
+class TransportConn:
+  """Socket-like adapter of an asyncio transport, used as `TcpClient.conn`."""
+  def __init__(self, transport: asyncio.Transport):
+    self.transport = transport
+
+  def sendall(self, data: bytes):
+    self.transport.write(data)
+
+  def sendmsg(self, bufs: list[bytes]):
+    self.transport.writelines(bufs)
+    return sum(len(buf) for buf in bufs)
+
+  def close(self):
+    self.transport.close()
+
+class GSProtocol(asyncio.Protocol):
+  """Connection of a GS TCP service.
+
+  Received messages are framed as they arrive and handled in order by a per-connection task, handlers with a coroutine variant are awaited and the ones marked to offload run in the default executor.
+  Reading pauses while too many messages wait for their handlers."""
+  def __init__(self, handlers: gsm.Registry, clients: list[client.TcpClient]):
+    self.handlers = handlers
+    self.clients = clients
+    self.clt: client.TcpClient = None
+    self.transport: asyncio.Transport = None
+    self.framer = gsm.Framer()
+    self.queue: asyncio.Queue[bytes] = asyncio.Queue()
+    """Received messages, `None` on disconnection."""
+    self.task: asyncio.Task = None
+
+  def connection_made(self, transport: asyncio.Transport):
+    self.transport = transport
+    self.clt = client.TcpClient((TransportConn(transport), transport.get_extra_info('peername')))
+    self.clients.append(self.clt)
+    print(f"Connection from {self.clt.addr}")
+    self.task = asyncio.get_running_loop().create_task(self.__process())
+
+  def data_received(self, data: bytes):
+    self.framer.feed(data)
+    try:
+      for frame in self.framer.frames():
+        # frames are only valid until the next feed
+        self.queue.put_nowait(bytes(frame))
+    except BufferError:
+      traceback.print_exc()
+      self.clt.conn.close()
+      return
+    if self.queue.qsize() >= QUEUE_HIGH_WATER and self.transport.is_reading():
+      self.transport.pause_reading()
+
+  def connection_lost(self, exc: Exception):
+    print("No more data from", self.clt.addr)
+    self.queue.put_nowait(None)
+    self.clients.remove(self.clt)
+
+  async def __process(self):
+    loop = asyncio.get_running_loop()
+    clt = self.clt
+    try:
+      while (frame := await self.queue.get()) is not None:
+        if self.queue.qsize() <= QUEUE_LOW_WATER and not self.transport.is_reading():
+          self.transport.resume_reading()
+        req = gsm.Message(clt.sv_cipher, in_buf=frame)
+        print(req)
+        if self.handlers.awaits(req):
+          res = await self.handlers.dispatch_async(clt, req)
+        elif self.handlers.offloads(req):
+          res = await loop.run_in_executor(None, self.handlers.dispatch, clt, req)
+        else:
+          res = self.handlers.dispatch(clt, req)
+        if res:
+          print(res)
+          clt.send(bytes(res))
+        elif req.header.type != gsm.MESSAGE_TYPE.STILLALIVE:
+          clt.send(frame)
+        # responses to all received messages go out together
+        if self.queue.empty():
+          clt.flush()
+    except Exception:
+      traceback.print_exc()
+      clt.conn.close()
+
+async def serve(address: tuple[str, int], handlers: gsm.Registry, clients: list[client.TcpClient], reuse_port = False):
+  """Serves a GS TCP service until cancelled, `reuse_port` lets several processes share the port (`SO_REUSEPORT`)."""
+  loop = asyncio.get_running_loop()
+  server = await loop.create_server(lambda: GSProtocol(handlers, clients), address[0], address[1], reuse_port=reuse_port)
+  async with server:
+    await server.serve_forever()
+
+class DatagramProtocol(asyncio.DatagramProtocol):
+  """Endpoint of a UDP service, each datagram is passed to `handler(data, address, sendto)`."""
+  def __init__(self, handler: Callable[[bytes, tuple[str, int], Callable], None]):
+    self.handler = handler
+    self.transport: asyncio.DatagramTransport = None
+
+  def connection_made(self, transport: asyncio.DatagramTransport):
+    self.transport = transport
+
+  def datagram_received(self, data: bytes, address: tuple[str, int]):
+    try:
+      self.handler(data, address, self.transport.sendto)
+    except Exception:
+      traceback.print_exc()
+
+async def serve_udp(address: tuple[str, int], handler: Callable[[bytes, tuple[str, int], Callable], None]):
+  """Serves a UDP service until cancelled."""
+  loop = asyncio.get_running_loop()
+  transport, _ = await loop.create_datagram_endpoint(lambda: DatagramProtocol(handler), local_addr=address)
+  try:
+    await loop.create_future()
+  finally:
+    transport.close()
@@ -1,24 +1,59 @@
-import math, utils
+import array, collections, importlib.util, math, threading
 
-def encrypt(input: bytes):
-  """GS XOR encryption algorithm."""
-  size = len(input)
-  result = bytearray(input)
-  for i in range(size):
-    result[i] ^= (i - 119) & 0xff
+PERMUTATION_CACHE_BYTES = 16 * 1024 * 1024
+"""Max memory of the cached permutation tables, the least recently used sizes are evicted first."""
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+"""NumPy is installed. It's only imported on first use."""
+
+NUMPY_MIN_SIZE = 1024
+"""Min payload size for `mask` to use NumPy, if installed."""
+
+KEYSTREAM_PERIOD = bytes((i - 119) & 0xff for i in range(256))
+"""One period of the XOR keystream."""
+
+keystream = bytes()
+"""XOR keystream, grown to the largest payload seen."""
+
+permutations: collections.OrderedDict[int, tuple[array.array, array.array]] = collections.OrderedDict()
+"""Cached permutation tables by payload size, in least recently used order."""
+
+permutations_bytes = 0
+"""Memory of the cached permutation tables."""
+
+permutations_lock = threading.Lock()
+
+def permutation(size: int):
+  """Returns the permutation tables for payloads of the size, cached up to `PERMUTATION_CACHE_BYTES`."""
+  global permutations_bytes
+  with permutations_lock:
+    tables = permutations.get(size)
+    if tables is not None:
+      permutations.move_to_end(size)
+      return tables
+  tables = build_permutation(size)
+  nbytes = sum(table.itemsize * len(table) for table in tables)
+  with permutations_lock:
+    if nbytes <= PERMUTATION_CACHE_BYTES and size not in permutations:
+      while permutations_bytes + nbytes > PERMUTATION_CACHE_BYTES:
+        _, evicted = permutations.popitem(last=False)
+        permutations_bytes -= sum(table.itemsize * len(table) for table in evicted)
+      permutations[size] = tables
+      permutations_bytes += nbytes
+  return tables
+
+def build_permutation(size: int):
+  """Returns the diagonal zig-zag permutation for payloads of the size.
 
+  `enc[k]` is the input index of the k-th encrypted byte, `dec[i]` is the encrypted index of the i-th decrypted byte."""
   size_root = int(math.sqrt(size))
   if size_root ** 2 < size:
     size_root += 1
 
-  new_size = 2 * size_root ** 2
-  buf = bytearray(new_size)
-  for i in range(new_size):
-    buf[i] = 0xff
-
-  buf = utils.read_as_i16_list(bytes(buf))
+  # square matrix position of every input byte
+  positions = []
   a = b = 0
-  for i in range(size):
+  for _ in range(size):
     if a < size_root:
       if b < 0:
         b = a
@@ -26,72 +61,42 @@ def encrypt(input: bytes):
     else:
       a = b + 2
       b = size_root - 1
-    buf[a + size_root * b] = result[i]
+    positions.append(a + size_root * b)
     a += 1
     b -= 1
-  
-  idx = 0
-  for j in range(size_root):
-    for k in range(size_root):
-      if buf[k + size_root * j] != -1:
-        result[idx] = buf[k + size_root * j]
-        idx += 1
 
-  return bytes(result)
+  enc = sorted(range(size), key=positions.__getitem__)
+  dec = [0] * size
+  for k, i in enumerate(enc):
+    dec[i] = k
+  # 2 or 4 bytes per index instead of an int object
+  typecode = 'H' if size <= 0x10000 else 'I'
+  return array.array(typecode, enc), array.array(typecode, dec)
 
-def decrypt(input: bytes):
-  """GS XOR decryption algorithm."""
+def mask(input: bytes):
+  """XORs the buffer with the keystream in a single pass."""
+  global keystream
   size = len(input)
-  result = bytearray(input)
-  root = math.sqrt(size)
-  size_root = int(root)
-  if float(size_root) < root:
-    size_root += 1
-  new_size = size_root ** 2
-  buf = bytearray(new_size)
+  # read once, other threads may replace it
+  ks = keystream
+  if len(ks) < size:
+    ks = keystream = KEYSTREAM_PERIOD * (size // 256 + 1)
 
-  a = b = 0
-  if size > 0:
-    size_cpy = size
-    while size_cpy > 0:
-      if b < size_root:
-        if a < 0:
-          a = b
-          b = 0
-      else:
-        b = a + 2
-        a = size_root - 1
-      buf[b + size_root * a] = 1
-      a -= 1
-      b += 1
-      size_cpy -= 1
-
-  c = d = 0
-  if size > 0:
-    count = 0
-    while d < size:
-      if c >= size_root:
-        count += size_root
-        c = 0
-      if buf[count + c] > 0:
-        buf[count + c] = input[d]
-        d += 1
-      c += 1
-  
-  e = f = 0
-  for idx in range(size):
-    if f < size_root:
-      if e < 0:
-        e = f
-        f = 0
-    else:
-      f = e + 2
-      e = size_root - 1
-    result[idx] = buf[f + size_root * e]
-    e -= 1
-    f += 1
+  if HAS_NUMPY and size >= NUMPY_MIN_SIZE:
+    import numpy as np
+    buf = np.frombuffer(input, dtype=np.uint8)
+    return (buf ^ np.frombuffer(ks, dtype=np.uint8, count=size)).tobytes()
 
-  for i in range(size):
-    result[i] ^= (i - 119) & 0xff
+  # big integer XOR of the whole buffer
+  nb = int.from_bytes(input, 'little') ^ int.from_bytes(ks[:size], 'little')
+  return nb.to_bytes(size, 'little')
 
-  return bytes(result)
+def encrypt(input: bytes):
+  """GS XOR encryption algorithm."""
+  enc, _ = permutation(len(input))
+  return bytes(map(mask(input).__getitem__, enc))
+
+def decrypt(input: bytes):
+  """GS XOR decryption algorithm."""
+  _, dec = permutation(len(input))
+  return mask(bytes(map(memoryview(input).cast('B').__getitem__, dec)))
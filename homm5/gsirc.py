@@ -446,7 +446,7 @@ class IRCServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
     super().__init__(*args, **kwargs)
 
 
-def get_args():
+def get_args(args: list[str] = None):
   parser = argparse.ArgumentParser()
   parser.add_argument(
     "-a",
@@ -464,18 +464,26 @@ def get_args():
     help="Port on which to listen",
   )
   jaraco.logging.add_arguments(parser)
-  return parser.parse_args()
+  return parser.parse_args(args)
+
+
+def setup_logging():
+  """Configures logging with the default options, for hosts calling `start_server` without `main`."""
+  jaraco.logging.setup(get_args([]))
+
+
+def start_server(bind_address: tuple[str, int] = SERVER_ADDRESS):
+  """Runs the IRC service in the calling thread."""
+  ircserver = IRCServer(bind_address, IRCClient)
+  log.info(f'\tIRC server is listening on port {bind_address[1]}')
+  ircserver.serve_forever()
 
 
 def main():
   options = get_args()
   jaraco.logging.setup(options)
   try:
-    bind_address = options.listen_address, options.listen_port
-    ircserver = IRCServer(bind_address, IRCClient)
-    _tmpl = '\tIRC server is listening on port {listen_port}'
-    log.info(_tmpl.format(**vars(options)))
-    ircserver.serve_forever()
+    start_server((options.listen_address, options.listen_port))
   except OSError as e:
     log.error(repr(e))
     raise SystemExit(-2) from None
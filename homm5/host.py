@@ -0,0 +1,168 @@
+import argparse, asyncio, importlib, multiprocessing, socket, threading, sys, os
+# relative module import stuff
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_dir)
+import client, pkc, prefork, threadserver
+
+SERVICES = {
+  "gsnat": "gsnat",
+  "irc": "gsirc",
+  "router": "router",
+  "cdkey": "cdkey",
+  "router_wm": "router_wm",
+  "proxy": "proxy",
+  "proxy_wm": "proxy_wm",
+  "lobby": "lobby"
+}
+"""Module of each service, in startup order."""
+
+THREADED_SERVICES = ["irc"]
+"""Services with a blocking `start_server`, run in a daemon thread next to the event loop."""
+
+PREFORK_SERVICES = ["router", "router_wm", "proxy", "proxy_wm"]
+"""Services without shared state, which prefork workers can serve on a shared port."""
+
+def snapshot(modules: dict):
+  """Cumulative stats of the services running in this process."""
+  return {
+    "handlers": {service: module.HANDLERS.stats() for service, module in modules.items() if hasattr(module, "HANDLERS")},
+    "send": client.send_stats(),
+    "key_pool": pkc.KEY_POOL.stats(),
+    "threads": threadserver.stats()
+  }
+
+async def report_stats(modules: dict, stats: multiprocessing.Queue):
+  while True:
+    await asyncio.sleep(prefork.STATS_INTERVAL)
+    prefork.report(stats, snapshot(modules))
+
+async def print_stats(modules: dict):
+  while True:
+    await asyncio.sleep(prefork.STATS_INTERVAL)
+    print(f"Stats: {snapshot(modules)}")
+
+async def serve(services: list[str], reuse_port = False, stats: multiprocessing.Queue = None, threads = 0):
+  """Runs the services in the running event loop, sharing the process' codec caches and key pool.
+
+  With `reuse_port` the prefork services share their port with other processes, `stats` receives reports for a `prefork.Supervisor`.
+  With `threads` the GS TCP services run on thread pools of that size instead of the event loop."""
+  # imported on demand, the IRC service has extra dependencies
+  modules = {service: importlib.import_module(SERVICES[service]) for service in services}
+  coros = []
+  for service, module in modules.items():
+    if service in THREADED_SERVICES:
+      # same logging as when the service runs on its own
+      if hasattr(module, "setup_logging"):
+        module.setup_logging()
+      threading.Thread(target=module.start_server, name=service, daemon=True).start()
+      print(f"{service} service is running in a thread")
+    elif threads > 0 and hasattr(module, "serve_threaded"):
+      threading.Thread(target=module.serve_threaded, args=(threads,), name=service, daemon=True).start()
+    elif reuse_port and service in PREFORK_SERVICES:
+      coros.append(module.serve(reuse_port))
+    else:
+      coros.append(module.serve())
+  if stats is not None:
+    coros.append(report_stats(modules, stats))
+  elif threads > 0:
+    coros.append(print_stats(modules))
+  await asyncio.gather(*coros)
+  # only threaded services selected
+  await asyncio.get_running_loop().create_future()
+
+def run(services: list[str], reuse_port = False, rsa_workers: int = None, stats: multiprocessing.Queue = None, threads = 0):
+  """Runs the services in one event loop, `rsa_workers` overrides the size of the RSA process pool."""
+  if rsa_workers is not None:
+    pkc.RSA_WORKERS = rsa_workers
+  try:
+    asyncio.run(serve(services, reuse_port, stats, threads))
+  except KeyboardInterrupt:
+    pass
+
+def spread(services: list[str], processes: int):
+  """Splits the services round-robin into at most `processes` groups."""
+  return [services[idx::processes] for idx in range(min(processes, len(services)))]
+
+def run_processes(services: list[str], processes: int, threads = 0):
+  """Runs the services spread across processes, each with its own event loop."""
+  workers = [multiprocessing.Process(target=run, args=(group,), kwargs={"threads": threads}, name=",".join(group)) for group in spread(services, processes)]
+  for worker in workers:
+    worker.start()
+    print(f"Started process {worker.pid}: {worker.name}")
+  try:
+    for worker in workers:
+      worker.join()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    for worker in workers:
+      worker.terminate()
+    for worker in workers:
+      worker.join()
+
+def run_prefork(services: list[str], workers: int):
+  """Runs the prefork services in `workers` processes sharing their ports, the others in one more process."""
+  shared = [service for service in services if service in PREFORK_SERVICES]
+  rest = [service for service in services if service not in PREFORK_SERVICES]
+  # the workers split the cores for their RSA process pools
+  rsa_workers = max(1, (os.cpu_count() or 1) // workers)
+  groups = [(shared, True, rsa_workers)] * workers if shared else []
+  if rest:
+    groups.append((rest, False, None))
+  prefork.Supervisor(run, groups).run()
+
+def get_args():
+  parser = argparse.ArgumentParser(description="Runs Heroes of Might and Magic V online services.")
+  parser.add_argument(
+    "services",
+    nargs="*",
+    default=list(SERVICES),
+    metavar="service",
+    help=f"Services to run, all by default: {', '.join(SERVICES)}",
+  )
+  parser.add_argument(
+    "-p",
+    "--processes",
+    type=int,
+    default=1,
+    help="Number of processes to spread the services across",
+  )
+  parser.add_argument(
+    "-w",
+    "--workers",
+    type=int,
+    default=1,
+    help=f"Number of prefork worker processes sharing the ports of {', '.join(PREFORK_SERVICES)}",
+  )
+  parser.add_argument(
+    "-t",
+    "--threads",
+    type=int,
+    default=0,
+    help="Size of the thread pool of each GS TCP service, which then runs without the event loop",
+  )
+  options = parser.parse_args()
+  unknown = [service for service in options.services if service not in SERVICES]
+  if unknown:
+    parser.error(f"unknown services: {', '.join(unknown)}")
+  if options.workers > 1 and options.processes > 1:
+    parser.error("--workers and --processes are exclusive")
+  if options.workers > 1 and options.threads > 0:
+    parser.error("--workers and --threads are exclusive")
+  if options.workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+    parser.error("--workers requires SO_REUSEPORT support")
+  return options
+
+def main():
+  options = get_args()
+  # keeps startup order, drops duplicates
+  services = [service for service in SERVICES if service in options.services]
+  if options.workers > 1:
+    run_prefork(services, options.workers)
+  elif options.processes > 1:
+    run_processes(services, options.processes, options.threads)
+  else:
+    run(services, threads=options.threads)
+
+if __name__ == "__main__":
+  main()
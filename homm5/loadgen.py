@@ -0,0 +1,68 @@
+import argparse, asyncio, statistics, time, sys, os
+# relative module import stuff
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_dir)
+import blowfish, gsm, h5, pkc
+from gsclient import request, read_message
+
+LOGIN_TYPES = {
+  "router": gsm.MESSAGE_TYPE.LOGIN,
+  "router_wm": gsm.MESSAGE_TYPE.LOGINWAITMODULE,
+  "proxy": gsm.MESSAGE_TYPE.LOGIN,
+  "proxy_wm": gsm.MESSAGE_TYPE.LOGINWAITMODULE
+}
+"""Login message of each target service."""
+
+async def session(address: tuple[str, int], login: gsm.MESSAGE_TYPE, game_key: bytes):
+  """Runs a client session: both `KEY_EXCHANGE` steps and a login."""
+  reader, writer = await asyncio.open_connection(*address)
+  try:
+    writer.write(request(gsm.MESSAGE_TYPE.KEY_EXCHANGE, ['1', ['1', str(len(game_key)), game_key]]))
+    res = await read_message(reader)
+    sv_pubkey = pkc.RsaPublicKey.from_buf(bytes(res.dl.lst[1][2])).to_pubkey()
+    enc_key = pkc.encrypt(blowfish.Cipher.keygen(16), sv_pubkey)
+    writer.write(request(gsm.MESSAGE_TYPE.KEY_EXCHANGE, ['2', ['1', str(len(enc_key)), enc_key]]))
+    await read_message(reader)
+    writer.write(request(login, ['loadgen']))
+    res = await read_message(reader)
+    if res.header.type != gsm.MESSAGE_TYPE.GSSUCCESS:
+      raise ValueError(f"Unexpected {login.name} response: {res.header.type.name}.")
+  finally:
+    writer.close()
+    await writer.wait_closed()
+
+async def generate(service: str, sessions: int, concurrency: int):
+  """Runs `sessions` sessions with up to `concurrency` at once, returns their latencies, the error counts by type and the elapsed time."""
+  address = h5.ENDPOINTS[service]
+  game_key = bytes(pkc.RsaPublicKey.from_pubkey(pkc.keygen()[0]))
+  latencies: list[float] = []
+  errors: dict[str, int] = {}
+  remaining = iter(range(sessions))
+
+  async def worker():
+    for _ in remaining:
+      start = time.perf_counter()
+      try:
+        await session(address, LOGIN_TYPES[service], game_key)
+        latencies.append(time.perf_counter() - start)
+      except (OSError, ValueError, asyncio.IncompleteReadError) as err:
+        errors[type(err).__name__] = errors.get(type(err).__name__, 0) + 1
+
+  start = time.perf_counter()
+  await asyncio.gather(*(worker() for _ in range(concurrency)))
+  return latencies, errors, time.perf_counter() - start
+
+def main():
+  parser = argparse.ArgumentParser(description="Local load generator for the GS TCP services, e.g. run by `host.py --workers N`.")
+  parser.add_argument("-n", "--sessions", type=int, default=1000, help="Number of sessions")
+  parser.add_argument("-c", "--concurrency", type=int, default=50, help="Number of concurrent sessions")
+  parser.add_argument("-s", "--service", default="router", choices=list(LOGIN_TYPES), help="Target service")
+  options = parser.parse_args()
+  latencies, errors, elapsed = asyncio.run(generate(options.service, options.sessions, options.concurrency))
+  print(f"{len(latencies)} sessions in {elapsed:.2f}s ({len(latencies) / elapsed:.1f}/s), errors: {errors or None}")
+  if len(latencies) > 1:
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f"latency: p50 {quantiles[49] * 1000:.1f}ms, p99 {quantiles[98] * 1000:.1f}ms, max {max(latencies) * 1000:.1f}ms")
+
+if __name__ == "__main__":
+  main()
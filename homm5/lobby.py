@@ -1,8 +1,8 @@
-import socket, sys, os
+import asyncio, sys, os
 # relative module import stuff
 root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(root_dir)
-import gsm, client, h5
+import gsm, gsserver, threadserver, client, h5
 from group import Room, LSM, MemberInfo, PLAYER_STATUS
 from h5_data import H5_Room, H5_RoomInfo, H5_Serializer
 
@@ -18,139 +18,130 @@ g_rooms: list[H5_Room] = []
 next_room_id = 1000
 """Global room id assignment counter."""
 
-def handle_req(clt: client.TcpClient, req: gsm.Message):
-  """Handler for `gsm.Message` requests."""
+ROOMS_LOCK = threadserver.TimedLock("lobby.rooms")
+"""Guards `g_rooms`, the rooms in it and `next_room_id`."""
+
+HANDLERS = gsm.Registry()
+"""Request handlers of the service."""
+HANDLERS.add(gsm.MESSAGE_TYPE.STILLALIVE, gsm.handle_still_alive)
+
+@HANDLERS.handler(gsm.MESSAGE_TYPE.LOGINWAITMODULE)
+def handle_login_wait_module(clt: client.TcpClient, req: gsm.Message):
+  clt.username = req.dl.lst[0]
+  return gsm.LoginWaitModuleResponse(req)
+
+@HANDLERS.handler(gsm.MESSAGE_TYPE.LOBBYSERVERLOGIN)
+def handle_lobby_server_login(clt: client.TcpClient, req: gsm.Message):
+  clt.username = req.dl.lst[0]
+  return gsm.LobbyServerLoginResponse(req)
+
+@HANDLERS.handler(gsm.MESSAGE_TYPE.LOBBY_MSG, gsm.LOBBY_MSG.JOIN_SERVER)
+def handle_join_server(clt: client.TcpClient, req: gsm.Message):
+  return gsm.JoinLobbyServerResponse(req, SERVER_ADDRESS)
+
+@HANDLERS.handler(gsm.MESSAGE_TYPE.LOBBY_MSG, gsm.LOBBY_MSG.GROUP_INFO_GET)
+def handle_group_info_get(clt: client.TcpClient, req: gsm.Message):
+  return gsm.GetGroupInfoResponse(req)
+
+@HANDLERS.handler(gsm.MESSAGE_TYPE.LOBBY_MSG, gsm.LOBBY_MSG.CREATE_ROOM)
+def handle_create_room(clt: client.TcpClient, req: gsm.Message):
   global next_room_id
-  res = None
-  match req.header.type:
-    case gsm.MESSAGE_TYPE.STILLALIVE:
-      pass
-    case gsm.MESSAGE_TYPE.LOGINWAITMODULE:
-      clt.username = req.dl.lst[0]
-      res = gsm.LoginWaitModuleResponse(req)
-    case gsm.MESSAGE_TYPE.LOBBYSERVERLOGIN:
-      clt.username = req.dl.lst[0]
-      res = gsm.LobbyServerLoginResponse(req)
-    case gsm.MESSAGE_TYPE.LOBBY_MSG:
-      subtype = gsm.LOBBY_MSG(int(req.dl.lst[0]))
-      match subtype:
-        case gsm.LOBBY_MSG.JOIN_SERVER:
-          res = gsm.JoinLobbyServerResponse(req, SERVER_ADDRESS)
-        case gsm.LOBBY_MSG.GROUP_INFO_GET:
-          group_id = int(req.dl.lst[1][0])
-          res = gsm.GetGroupInfoResponse(req)
-        case gsm.LOBBY_MSG.CREATE_ROOM:
-          room_id = next_room_id
-          next_room_id = next_room_id + 1
-          res = gsm.CreateRoomResponse(req, g_rooms, room_id, clt.username)
-        case gsm.LOBBY_MSG.LOGIN:
-          game_name = req.dl.lst[1][0]
-          res = gsm.LobbyMsgResponse(req)
-        case gsm.LOBBY_MSG.JOIN_LOBBY:
-          res = gsm.JoinLobbyResponse(req)
-        case gsm.LOBBY_MSG.JOIN_ROOM:
-          group_id = int(req.dl.lst[1][0])
-          room = next((r for r in g_rooms if r.gs_room.group_id == group_id), None)
-          res = gsm.JoinRoomResponse(req)
-          # GROUP_INFO notification
-          if room is not None:
-            header = gsm.GSMessageHeader.from_params(gsm.PROPERTY.GS, 1, gsm.MESSAGE_TYPE.LOBBY_MSG, gsm.SENDER_RECEIVER.S, gsm.SENDER_RECEIVER.P)
-            flags = int(req.dl.lst[1][2]) # LSM (iconfig, group flags)
-            # homm5 always requests all info
-            if flags == LSM.LSM_ALLINFO.value:
-              subtype = str(gsm.LOBBY_MSG.GROUP_INFO.value)
-              # subroom children are not a feature
-              subrooms: list[Room] = []
-              info = MemberInfo(clt.username, str(group_id))
-              info.status = int(PLAYER_STATUS.PS_GAMECONNECTED.value)
-              info.set_player_info(8888, 0)
-              group_members: list[MemberInfo] = info.to_list()
-              # update buffer
-              room.gs_room.group_info = H5_Serializer().serialize_roominfo(room.room_info)
-              dl = gsm.List([subtype, [str(group_id), str(flags), room.gs_room.to_list(), subrooms, group_members]])
-              msg = gsm.Message(clt.sv_bf_key, header=header, dl=dl)
-              notif = gsm.GSMNotification(msg)
-              print(notif)
-              notif.send_tcp(clt)
-            else:
-              raise NotImplementedError(f"Unexpected GROUP_INFO iconfig value: {flags}.")
-          else:
-            raise ValueError("Failed to find the requested room on join.")
-        case gsm.LOBBY_MSG.GROUP_CONFIG_UPDATE_RES:
-          group_id = int(req.dl.lst[1][0])
-          room = next((r for r in g_rooms if r.gs_room.group_id == group_id), None)
-          if room is None:
-            raise ValueError(f'Room {group_id} not found on GROUP_CONFIG_UPDATE_RES.')
-          res = gsm.GroupConfigUpdateResultResponse(req, room)
-          # process group_info buffer
-          room.room_info = H5_Serializer().deserialize_roominfo(room.gs_room.group_info)
-          # GROUP_INFO notification
-          header = gsm.GSMessageHeader.from_params(gsm.PROPERTY.GS, 1, gsm.MESSAGE_TYPE.LOBBY_MSG, gsm.SENDER_RECEIVER.S, gsm.SENDER_RECEIVER.P)
-          flags = LSM.LSM_ALLINFO.value # LSM (iconfig, group flags)
-          subtype = str(gsm.LOBBY_MSG.GROUP_INFO.value)
-          # subroom children are not a feature
-          subrooms: list[Room] = []
-          info = MemberInfo(clt.username, str(group_id))
-          info.status = int(PLAYER_STATUS.PS_GAMECONNECTED.value)
-          info.set_player_info(8888, 0)
-          group_members: list[MemberInfo] = info.to_list()
-          # update buffer
-          room.gs_room.group_info = H5_Serializer().serialize_roominfo(room.room_info)
-          dl = gsm.List([subtype, [str(group_id), str(flags), room.gs_room.to_list(), subrooms, group_members]])
-          msg = gsm.Message(clt.sv_bf_key, header=header, dl=dl)
-          notif = gsm.GSMNotification(msg)
-          print(notif)
-          notif.send_tcp(clt)
-        case gsm.LOBBY_MSG.GAME_CONNECTED:
-          group_id = int(req.dl.lst[1][0])
-        case _:
-          raise NotImplementedError(f'No request handler for {subtype.name} lobby message.')
-    case _:
-      raise NotImplementedError(f"No request handler for {req.header.type.name} messages.")
+  with ROOMS_LOCK:
+    room_id = next_room_id
+    next_room_id = next_room_id + 1
+    return gsm.CreateRoomResponse(req, g_rooms, room_id, clt.username)
+
+@HANDLERS.handler(gsm.MESSAGE_TYPE.LOBBY_MSG, gsm.LOBBY_MSG.LOGIN)
+def handle_lobby_login(clt: client.TcpClient, req: gsm.Message):
+  game_name = gsm.lobby_args(req).game_name
+  return gsm.LobbyMsgResponse(req)
+
+@HANDLERS.handler(gsm.MESSAGE_TYPE.LOBBY_MSG, gsm.LOBBY_MSG.JOIN_LOBBY)
+def handle_join_lobby(clt: client.TcpClient, req: gsm.Message):
+  return gsm.JoinLobbyResponse(req)
+
+@HANDLERS.handler(gsm.MESSAGE_TYPE.LOBBY_MSG, gsm.LOBBY_MSG.JOIN_ROOM)
+def handle_join_room(clt: client.TcpClient, req: gsm.Message):
+  args: gsm.JoinRoomArgs = gsm.lobby_args(req)
+  group_id = args.group_id
+  with ROOMS_LOCK:
+    room = next((r for r in g_rooms if r.gs_room.group_id == group_id), None)
+    res = gsm.JoinRoomResponse(req)
+    if room is None:
+      raise ValueError("Failed to find the requested room on join.")
+    # GROUP_INFO notification
+    header = gsm.GSMessageHeader.from_params(gsm.PROPERTY.GS, 1, gsm.MESSAGE_TYPE.LOBBY_MSG, gsm.SENDER_RECEIVER.S, gsm.SENDER_RECEIVER.P)
+    flags = args.flags # LSM (iconfig, group flags)
+    # homm5 always requests all info
+    if flags != LSM.LSM_ALLINFO.value:
+      raise NotImplementedError(f"Unexpected GROUP_INFO iconfig value: {flags}.")
+    subtype = str(gsm.LOBBY_MSG.GROUP_INFO.value)
+    # subroom children are not a feature
+    subrooms: list[Room] = []
+    info = MemberInfo(clt.username, str(group_id))
+    info.status = int(PLAYER_STATUS.PS_GAMECONNECTED.value)
+    info.set_player_info(8888, 0)
+    group_members: list[MemberInfo] = info.to_list()
+    # update buffer
+    room.gs_room.group_info = H5_Serializer().serialize_roominfo(room.room_info)
+    dl = gsm.List([subtype, [str(group_id), str(flags), room.gs_room.to_list(), subrooms, group_members]])
+  msg = gsm.Message(clt.sv_cipher, header=header, dl=dl)
+  notif = gsm.GSMNotification(msg)
+  print(notif)
+  notif.send_tcp(clt)
   return res
 
-def start_server():
-  sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+@HANDLERS.handler(gsm.MESSAGE_TYPE.LOBBY_MSG, gsm.LOBBY_MSG.GROUP_CONFIG_UPDATE_RES)
+def handle_group_config_update_res(clt: client.TcpClient, req: gsm.Message):
+  group_id = gsm.lobby_args(req).group_id
+  with ROOMS_LOCK:
+    room = next((r for r in g_rooms if r.gs_room.group_id == group_id), None)
+    if room is None:
+      raise ValueError(f'Room {group_id} not found on GROUP_CONFIG_UPDATE_RES.')
+    res = gsm.GroupConfigUpdateResultResponse(req, room)
+    # process group_info buffer
+    room.room_info = H5_Serializer().deserialize_roominfo(room.gs_room.group_info)
+    # GROUP_INFO notification
+    header = gsm.GSMessageHeader.from_params(gsm.PROPERTY.GS, 1, gsm.MESSAGE_TYPE.LOBBY_MSG, gsm.SENDER_RECEIVER.S, gsm.SENDER_RECEIVER.P)
+    flags = LSM.LSM_ALLINFO.value # LSM (iconfig, group flags)
+    subtype = str(gsm.LOBBY_MSG.GROUP_INFO.value)
+    # subroom children are not a feature
+    subrooms: list[Room] = []
+    info = MemberInfo(clt.username, str(group_id))
+    info.status = int(PLAYER_STATUS.PS_GAMECONNECTED.value)
+    info.set_player_info(8888, 0)
+    group_members: list[MemberInfo] = info.to_list()
+    # update buffer
+    room.gs_room.group_info = H5_Serializer().serialize_roominfo(room.room_info)
+    dl = gsm.List([subtype, [str(group_id), str(flags), room.gs_room.to_list(), subrooms, group_members]])
+  msg = gsm.Message(clt.sv_cipher, header=header, dl=dl)
+  notif = gsm.GSMNotification(msg)
+  print(notif)
+  notif.send_tcp(clt)
+  return res
+
+@HANDLERS.handler(gsm.MESSAGE_TYPE.LOBBY_MSG, gsm.LOBBY_MSG.GAME_CONNECTED)
+def handle_game_connected(clt: client.TcpClient, req: gsm.Message):
+  """Client-side notification, no response needed."""
+  group_id = gsm.lobby_args(req).group_id
+  return None
+
+def handle_req(clt: client.TcpClient, req: gsm.Message):
+  """Handler for `gsm.Message` requests."""
+  return HANDLERS.dispatch(clt, req)
+
+async def serve():
+  """Runs the service in the running event loop."""
+  print(f"Lobby server is listening on port {SERVER_ADDRESS[1]}")
+  await gsserver.serve(SERVER_ADDRESS, HANDLERS, g_clients)
+
+def serve_threaded(threads = threadserver.POOL_SIZE):
+  """Runs the service on a thread pool, blocking the calling thread."""
   print(f"Lobby server is listening on port {SERVER_ADDRESS[1]}")
-  sock.bind(SERVER_ADDRESS)
-  sock.listen(5)
-    
-  while True:
-    clt = client.TcpClient(sock.accept())
-    g_clients.append(clt)
-    print(f"Connection from {clt.addr}")
-    try:
-      while True:
-        data = clt.conn.recv(4096)
-        if data:
-          req = gsm.Message(clt.sv_bf_key, in_buf=data)
-          if req.header.size < len(data):
-            bundle = gsm.GSMessageBundle(req, data[req.header.size:], clt)
-            print(bundle)
-            for msg in bundle.msgs:
-              print(msg)
-              res = handle_req(clt, msg)
-              if res:
-                print(res)
-                clt.conn.sendall(bytes(res))
-              elif req.header.type == gsm.LOBBY_MSG:
-                pass
-              elif req.header.type != gsm.MESSAGE_TYPE.STILLALIVE:
-                clt.conn.sendall(data)
-          else:
-            print(req)
-            res = handle_req(clt, req)
-            if res:
-              print(res)
-              clt.conn.sendall(bytes(res))
-            elif req.header.type != gsm.MESSAGE_TYPE.STILLALIVE:
-              clt.conn.sendall(data)
-        else:
-          print("No more data from", clt.addr)
-          break
-    finally:
-      clt.conn.close()
-      g_clients.remove(clt)
+  threadserver.serve(SERVER_ADDRESS, handle_req, g_clients, threads)
+
+def start_server():
+  asyncio.run(serve())
 
 if __name__ == "__main__":
     start_server()
@@ -1,8 +1,8 @@
-import socket, sys, os
+import asyncio, sys, os
 # relative module import stuff
 root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(root_dir)
-import gsm, pkc, client, h5
+import gsm, gsserver, threadserver, pkc, client, h5
 
 SERVER_ADDRESS = h5.ENDPOINTS["proxy"]
 """Address of the persistent data proxy module service."""
@@ -13,66 +13,39 @@ WAIT_MODULE = h5.ENDPOINTS["proxy_wm"]
 CLIENTS: list[client.TcpClient] = []
 """Global list of connected game clients."""
 
+HANDLERS = gsm.Registry()
+"""Request handlers of the service."""
+HANDLERS.add(gsm.MESSAGE_TYPE.STILLALIVE, gsm.handle_still_alive)
+HANDLERS.add(gsm.MESSAGE_TYPE.KEY_EXCHANGE, gsm.handle_key_exchange, coroutine=gsm.handle_key_exchange_async)
+
+@HANDLERS.handler(gsm.MESSAGE_TYPE.JOINWAITMODULE)
+def handle_join_wait_module(clt: client.TcpClient, req: gsm.Message):
+  return gsm.ProxyJoinWaitModuleResponse(req, WAIT_MODULE, clt.username)
+
+@HANDLERS.handler(gsm.MESSAGE_TYPE.LOGIN)
+def handle_login(clt: client.TcpClient, req: gsm.Message):
+  # todo: actual user auth here
+  clt.username = req.dl.lst[0]
+  return gsm.ProxyLoginResponse(req)
+
 def handle_req(clt: client.TcpClient, req: gsm.Message):
   """Handler for `gsm.Message` requests."""
-  res = None
-  match req.header.type:
-    case gsm.MESSAGE_TYPE.STILLALIVE:
-      pass
-    case gsm.MESSAGE_TYPE.JOINWAITMODULE:
-      res = gsm.ProxyJoinWaitModuleResponse(req, WAIT_MODULE, clt.username)
-    case gsm.MESSAGE_TYPE.LOGIN:
-      # todo: actual user auth here
-      clt.username = req.dl.lst[0]
-      res = gsm.ProxyLoginResponse(req)
-    case gsm.MESSAGE_TYPE.KEY_EXCHANGE:
-      match req.dl.lst[0]:
-        case '1':
-          clt.game_pubkey = pkc.RsaPublicKey.from_buf(req.dl.lst[1][2]).to_pubkey()
-          # keygen
-          pub_key, priv_key = pkc.keygen()
-          clt.sv_pubkey = pub_key
-          clt.sv_privkey = priv_key
-          res = gsm.KeyExchangeResponse(req, clt)
-        case '2':
-          enc_bf_key = bytes(req.dl.lst[1][2])
-          bf_key = pkc.decrypt(enc_bf_key, clt.sv_privkey)
-          clt.game_bf_key = bf_key
-          res = gsm.KeyExchangeResponse(req, clt)
-        case _:
-          raise BufferError(f'Unknown reqId ({req.dl[0]}) for a {req.header.type.name} message.')
-    case _:
-      raise NotImplementedError(f"No request handler for {req.header.type.name} messages.")
-  return res
+  return HANDLERS.dispatch(clt, req)
 
-def start_server():
-  sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+async def serve(reuse_port = False):
+  """Runs the service in the running event loop."""
+  pkc.KEY_POOL.start()
   print(f"Proxy service is listening on port {SERVER_ADDRESS[1]}")
-  sock.bind(SERVER_ADDRESS)
-  sock.listen(5)
-    
-  while True:
-    clt = client.TcpClient(sock.accept())
-    CLIENTS.append(clt)
-    print(f"Connection from {clt.addr}")
-    try:
-      while True:
-        data = clt.conn.recv(4096)
-        if data:
-          req = gsm.Message(clt.sv_bf_key, in_buf=data)
-          print(req)
-          res = handle_req(clt, req)
-          if res:
-            print(res)
-            clt.conn.sendall(bytes(res))
-          elif req.header.type != gsm.MESSAGE_TYPE.STILLALIVE:
-            clt.conn.sendall(data)
-        else:
-          print("No more data from", clt.addr)
-          break
-    finally:
-      clt.conn.close()
-      CLIENTS.remove(clt)
+  await gsserver.serve(SERVER_ADDRESS, HANDLERS, CLIENTS, reuse_port)
+
+def serve_threaded(threads = threadserver.POOL_SIZE):
+  """Runs the service on a thread pool, blocking the calling thread."""
+  pkc.KEY_POOL.start()
+  print(f"Proxy service is listening on port {SERVER_ADDRESS[1]}")
+  threadserver.serve(SERVER_ADDRESS, handle_req, CLIENTS, threads)
+
+def start_server():
+  asyncio.run(serve())
 
 if __name__ == "__main__":
     start_server()
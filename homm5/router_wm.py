@@ -1,8 +1,8 @@
-import socket, sys, os
+import asyncio, sys, os
 # relative module import stuff
 root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(root_dir)
-import gsm, pkc, client, group, h5
+import gsm, gsserver, threadserver, pkc, client, group, h5
 
 SERVER_ADDRESS = h5.ENDPOINTS["router_wm"]
 """Address of the router's wait module service."""
@@ -23,116 +23,80 @@ LOBBIES: list[group.Lobby] = [
 ]
 """Global list of available server lists."""
 
+HANDLERS = gsm.Registry()
+"""Request handlers of the service."""
+HANDLERS.add(gsm.MESSAGE_TYPE.STILLALIVE, gsm.handle_still_alive)
+HANDLERS.add(gsm.MESSAGE_TYPE.KEY_EXCHANGE, gsm.handle_key_exchange, coroutine=gsm.handle_key_exchange_async)
+
+@HANDLERS.handler(gsm.MESSAGE_TYPE.PLAYERINFO)
+def handle_player_info(clt: client.TcpClient, req: gsm.Message):
+  return gsm.PlayerInfoResponse(req, clt.username)
+
+@HANDLERS.handler(gsm.MESSAGE_TYPE.LOGINWAITMODULE)
+def handle_login_wait_module(clt: client.TcpClient, req: gsm.Message):
+  clt.username = req.dl.lst[0]
+  return gsm.LoginWaitModuleResponse(req)
+
+@HANDLERS.handler(gsm.MESSAGE_TYPE.LOGINFRIENDS)
+def handle_login_friends(clt: client.TcpClient, req: gsm.Message):
+  return gsm.LoginFriendsResponse(req)
+
+@HANDLERS.handler(gsm.MESSAGE_TYPE.PROXY_HANDLER)
+def handle_proxy_handler(clt: client.TcpClient, req: gsm.Message):
+  if gsm.is_list(req.dl.lst[0]):
+    return None
+  subtype = req.dl.lst[0]
+  if subtype == "1":
+    module = req.dl.lst[1][0]
+    match module:
+      case "persistantdata":
+        proxy = PROXY
+        proxy_id = "1"
+      case "ladderquery":
+        proxy = PROXY
+        proxy_id = "1"
+      case "remotealgorithm":
+        raise NotImplementedError(f"Remote algorithm proxy module unsupported")
+      case "clanservice":
+        raise NotImplementedError(f"Clan service proxy module unsupported")
+      case _:
+        raise NotImplementedError(f"Request for unknown proxy module {module}")
+    return gsm.ProxyHandlerResponse(req, proxy, proxy_id)
+  # proxy address doesnt matter here
+  return gsm.ProxyHandlerResponse(req, PROXY)
+
+@HANDLERS.handler(gsm.MESSAGE_TYPE.LOBBY_MSG, gsm.LOBBY_MSG.JOIN_SERVER)
+def handle_join_server(clt: client.TcpClient, req: gsm.Message):
+  return gsm.JoinLobbyServerResponse(req, LOBBY_SERVER)
+
+@HANDLERS.handler(gsm.MESSAGE_TYPE.LOBBY_MSG, gsm.LOBBY_MSG.LOGIN)
+def handle_lobby_login(clt: client.TcpClient, req: gsm.Message):
+  game_name = gsm.lobby_args(req).game_name
+  return gsm.LobbyMsgResponse(req)
+
+@HANDLERS.handler(gsm.MESSAGE_TYPE.LOBBY_MSG, gsm.LOBBY_MSG.CHANGE_REQUESTED_LOBBIES)
+def handle_change_requested_lobbies(clt: client.TcpClient, req: gsm.Message):
+  game_name = gsm.lobby_args(req).game_name
+  return gsm.GroupInfoResponse(req, LOBBIES)
+
 def handle_req(clt: client.TcpClient, req: gsm.Message):
   """Handler for `gsm.Message` requests."""
-  res = None
-  match req.header.type:
-    case gsm.MESSAGE_TYPE.PLAYERINFO:
-      res = gsm.PlayerInfoResponse(req, clt.username)
-    case gsm.MESSAGE_TYPE.STILLALIVE:
-      pass
-    case gsm.MESSAGE_TYPE.LOGINWAITMODULE:
-      clt.username = req.dl.lst[0]
-      res = gsm.LoginWaitModuleResponse(req)
-    case gsm.MESSAGE_TYPE.LOGINFRIENDS:
-      res = gsm.LoginFriendsResponse(req)
-    case gsm.MESSAGE_TYPE.PROXY_HANDLER:
-      if str(type(req.dl.lst[0])) == "<class 'list'>":
-        pass
-      else:
-        subtype = req.dl.lst[0]
-        if subtype == "1":
-          module = req.dl.lst[1][0]
-          match module:
-            case "persistantdata":
-              proxy = PROXY
-              proxy_id = "1"
-            case "ladderquery":
-              proxy = PROXY
-              proxy_id = "1"
-            case "remotealgorithm":
-              raise NotImplementedError(f"Remote algorithm proxy module unsupported")
-            case "clanservice":
-              raise NotImplementedError(f"Clan service proxy module unsupported")
-            case _:
-              raise NotImplementedError(f"Request for unknown proxy module {module}")
-          res = gsm.ProxyHandlerResponse(req, proxy, proxy_id)
-        else:
-          # proxy address doesnt matter here
-          res = gsm.ProxyHandlerResponse(req, PROXY)
-    case gsm.MESSAGE_TYPE.LOBBY_MSG:
-      subtype = gsm.LOBBY_MSG(int(req.dl.lst[0]))
-      match subtype:
-        case gsm.LOBBY_MSG.JOIN_SERVER:
-          res = gsm.JoinLobbyServerResponse(req, LOBBY_SERVER)
-        case gsm.LOBBY_MSG.LOGIN:
-          game_name = req.dl.lst[1][0]
-          res = gsm.LobbyMsgResponse(req)
-        case gsm.LOBBY_MSG.CHANGE_REQUESTED_LOBBIES:
-          game_name = req.dl.lst[1][0]
-          res = gsm.GroupInfoResponse(req, LOBBIES)
-        case _:
-          raise NotImplementedError(f'No request handler for {subtype.name} lobby message.')
-    case gsm.MESSAGE_TYPE.KEY_EXCHANGE:
-      match req.dl.lst[0]:
-        case '1':
-          clt.game_pubkey = pkc.RsaPublicKey.from_buf(req.dl.lst[1][2]).to_pubkey()
-          # keygen
-          pub_key, priv_key = pkc.keygen()
-          clt.sv_pubkey = pub_key
-          clt.sv_privkey = priv_key
-          res = gsm.KeyExchangeResponse(req, clt)
-        case '2':
-          enc_bf_key = bytes(req.dl.lst[1][2])
-          bf_key = pkc.decrypt(enc_bf_key, clt.sv_privkey)
-          clt.game_bf_key = bf_key
-          res = gsm.KeyExchangeResponse(req, clt)
-        case _:
-          raise BufferError(f'Unknown reqId ({req.dl[0]}) for a {req.header.type.name} message.')
-    case _:
-      raise NotImplementedError(f"No request handler for {req.header.type.name} messages.")
-  return res
+  return HANDLERS.dispatch(clt, req)
 
-def start_server():
-  sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+async def serve(reuse_port = False):
+  """Runs the service in the running event loop."""
+  pkc.KEY_POOL.start()
+  print(f"Router's wait module is listening on port {SERVER_ADDRESS[1]}")
+  await gsserver.serve(SERVER_ADDRESS, HANDLERS, CLIENTS, reuse_port)
+
+def serve_threaded(threads = threadserver.POOL_SIZE):
+  """Runs the service on a thread pool, blocking the calling thread."""
+  pkc.KEY_POOL.start()
   print(f"Router's wait module is listening on port {SERVER_ADDRESS[1]}")
-  sock.bind(SERVER_ADDRESS)
-  sock.listen(5)
-    
-  while True:
-    clt = client.TcpClient(sock.accept())
-    CLIENTS.append(clt)
-    print(f"Connection from {clt.addr}")
-    try:
-      while True:
-        data = clt.conn.recv(4096)
-        if data:
-          req = gsm.Message(clt.sv_bf_key, in_buf=data)
-          if req.header.size < len(data):
-            bundle = gsm.GSMessageBundle(req, data[req.header.size:], clt)
-            print(bundle)
-            for msg in bundle.msgs:
-              print(msg)
-              res = handle_req(clt, msg)
-              if res:
-                print(res)
-                clt.conn.sendall(bytes(res))
-              elif req.header.type != gsm.MESSAGE_TYPE.STILLALIVE:
-                clt.conn.sendall(data)
-          else:
-            print(req)
-            res = handle_req(clt, req)
-            if res:
-              print(res)
-              clt.conn.sendall(bytes(res))
-            elif req.header.type != gsm.MESSAGE_TYPE.STILLALIVE:
-              clt.conn.sendall(data)
-        else:
-          print("No more data from", clt.addr)
-          break
-    finally:
-      clt.conn.close()
-      CLIENTS.remove(clt)
+  threadserver.serve(SERVER_ADDRESS, handle_req, CLIENTS, threads)
+
+def start_server():
+  asyncio.run(serve())
 
 if __name__ == "__main__":
     start_server()
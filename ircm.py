@@ -1,5 +1,5 @@
 from blowfish import Cipher
-import utils
+import os, utils
 
 BLOWFISH_KEY = bytes([
   0x06, 0xE2, 0xC8, 0x46, 0x01, 0x90, 0x55, 0x7C,
@@ -7,7 +7,10 @@ BLOWFISH_KEY = bytes([
 ])
 """Static Blowfish key for IRC service."""
 
-BLOWFISH = Cipher(BLOWFISH_KEY)
+BLOWFISH_SNAPSHOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schedules', 'irc.bin')
+"""Precomputed key schedule of `BLOWFISH_KEY`, see `bfschedule.py`."""
+
+BLOWFISH = Cipher(BLOWFISH_KEY, snapshot=BLOWFISH_SNAPSHOT)
 
 IRCM_HEADER_SIZE = 2
 """Length of `IRCMessage` header in bytes."""
@@ -1,4 +1,4 @@
-import rsa, utils
+import concurrent.futures, multiprocessing, queue, rsa, threading, time, utils
 
 MAX_RSA_MODULUS_LEN = 128
 """Max length of modulus (n) in bytes."""
@@ -6,6 +6,15 @@ MAX_RSA_MODULUS_LEN = 128
 PUBLIC_KEY_LEN = 512
 """Public key length in bits."""
 
+KEY_POOL_WATERMARK = 8
+"""Default number of keypairs kept ready by `KeyPool`."""
+
+RSA_WORKERS: int = None
+"""Number of processes for offloaded RSA operations, defaults to CPU count."""
+
+RSA_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+"""Start method of the RSA processes, they don't inherit the threads and sockets of the services."""
+
 class RsaPublicKey:
   """Interface for public RSA key serialization."""
   def __init__(self, bits: int, n: int, e: int):
@@ -48,3 +57,111 @@ def encrypt(data: bytes, key: rsa.PublicKey):
 
 def decrypt(data: bytes, key: rsa.PrivateKey):
   return rsa.decrypt(data, key)
+
+TIMINGS = {
+  "keygen": utils.OpTimer(),
+  "decrypt": utils.OpTimer()
+}
+"""Timings of offloaded RSA operations."""
+
+executor: concurrent.futures.ProcessPoolExecutor = None
+"""Shared process pool for RSA operations, created on first use."""
+
+executor_lock = threading.Lock()
+"""Guards the creation of `executor` by concurrent first uses."""
+
+def offload(op: str, fn, *args) -> concurrent.futures.Future:
+  """Runs `fn(*args)` in the shared process pool and records its timing under `op`."""
+  global executor
+  if executor is None:
+    with executor_lock:
+      if executor is None:
+        executor = concurrent.futures.ProcessPoolExecutor(RSA_WORKERS, mp_context=multiprocessing.get_context(RSA_START_METHOD))
+  start = time.perf_counter()
+  future = executor.submit(fn, *args)
+  future.add_done_callback(lambda _: TIMINGS[op].record(time.perf_counter() - start))
+  return future
+
+def keygen_async():
+  """`keygen` in the shared process pool."""
+  return offload("keygen", keygen)
+
+def decrypt_async(data: bytes, key: rsa.PrivateKey):
+  """`decrypt` in the shared process pool."""
+  return offload("decrypt", decrypt, data, key)
+
+class KeyPool:
+  """Pool of pre-generated RSA keypairs, refilled up to the watermark by a background thread.
+
+  Keygen itself runs in the shared process pool, off the services' cores."""
+  def __init__(self, watermark: int = KEY_POOL_WATERMARK):
+    self.watermark = watermark
+    """Number of keypairs kept ready."""
+    self.keys: queue.Queue[tuple[rsa.PublicKey, rsa.PrivateKey]] = queue.Queue()
+    self.generated = 0
+    """Number of keypairs generated by the refill thread."""
+    self.gen_time = 0.0
+    """Wall time spent on refill keygen batches in seconds."""
+    self.hits = 0
+    self.misses = 0
+    """Number of pops from an empty pool, which wait for a keygen."""
+    self.__wakeup = threading.Event()
+    self.__thread: threading.Thread = None
+    self.__lock = threading.Lock()
+    """Guards the refill thread start and the counters."""
+
+  def start(self):
+    """Starts the refill thread."""
+    with self.__lock:
+      if self.__thread is None:
+        self.__thread = threading.Thread(target=self.__refill, name="KeyPool", daemon=True)
+        self.__thread.start()
+
+  def pop(self):
+    """Returns a ready keypair, waits for one from the process pool if the pool is empty."""
+    return self.pop_async().result()
+
+  def pop_async(self) -> concurrent.futures.Future:
+    """Like `pop`, but returns a future of the keypair instead of waiting for the process pool."""
+    try:
+      future = concurrent.futures.Future()
+      future.set_result(self.keys.get_nowait())
+      with self.__lock:
+        self.hits += 1
+    except queue.Empty:
+      with self.__lock:
+        self.misses += 1
+      future = keygen_async()
+    self.__wakeup.set()
+    return future
+
+  def stats(self):
+    """Pool depth and refill metrics."""
+    with self.__lock:
+      return {
+        "depth": self.keys.qsize(),
+        "watermark": self.watermark,
+        "generated": self.generated,
+        "refill_rate": self.generated / self.gen_time if self.gen_time > 0 else 0.0,
+        "hits": self.hits,
+        "misses": self.misses
+      }
+
+  def __refill(self):
+    while True:
+      # cleared before refilling so that pops during keygen are not lost
+      self.__wakeup.clear()
+      while (missing := self.watermark - self.keys.qsize()) > 0:
+        # the missing keypairs are generated concurrently by the process pool
+        start = time.perf_counter()
+        futures = [keygen_async() for _ in range(missing)]
+        for future in concurrent.futures.as_completed(futures):
+          self.keys.put(future.result())
+          with self.__lock:
+            self.generated += 1
+        with self.__lock:
+          self.gen_time += time.perf_counter() - start
+      self.__wakeup.wait()
+
+KEY_POOL = KeyPool()
+"""Shared keypair pool for `KEY_EXCHANGE` handshakes."""
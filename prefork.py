@@ -0,0 +1,110 @@
+import multiprocessing, multiprocessing.connection, os, queue, time
+from typing import Callable
+from utils import OpTimer
+
+STATS_INTERVAL = 10.0
+"""Seconds between stats reports of the workers."""
+
+RESTART_DELAY = 1.0
+"""Seconds to wait before restarting a worker that died, keeps a crashing worker from spinning."""
+
+SETTING_STATS = {"watermark", "threads"}
+"""Stats that are per-worker settings rather than counters, aggregated as their max."""
+
+GAUGE_STATS = {"depth", "queued", "refill_rate"}
+"""Stats measuring the current state of a worker rather than counting, summed over live workers only."""
+
+def merge_stats(total: dict, stats: dict):
+  """Adds nested stats into `total` and `OpTimer`s are merged.
+
+  Numbers are summed, so rates like `refill_rate` add up to the rate of all the workers, except `SETTING_STATS`."""
+  for key, value in stats.items():
+    if isinstance(value, dict):
+      merge_stats(total.setdefault(key, {}), value)
+    elif isinstance(value, OpTimer):
+      total.setdefault(key, OpTimer()).merge(value)
+    elif key in SETTING_STATS:
+      total[key] = max(total.get(key, value), value)
+    else:
+      total[key] = total.get(key, 0) + value
+  return total
+
+def counters(stats: dict):
+  """Returns the stats without `GAUGE_STATS` and `SETTING_STATS`, what still counts of a dead worker."""
+  return {key: counters(value) if isinstance(value, dict) else value for key, value in stats.items() if isinstance(value, dict) or key not in GAUGE_STATS | SETTING_STATS}
+
+def report(stats: multiprocessing.Queue, snapshot: dict):
+  """Sends the stats of the calling worker to its supervisor."""
+  stats.put((os.getpid(), snapshot))
+
+class Supervisor:
+  """Parent of prefork worker processes, restarts the ones that die and aggregates the stats they report.
+
+  Workers run `target(*args, stats)` and send cumulative stats with `report`."""
+  def __init__(self, target: Callable, workers: list[tuple]):
+    self.target = target
+    self.workers = workers
+    """Arguments of each worker."""
+    self.processes: list[multiprocessing.Process] = [None] * len(workers)
+    self.stats_queue = multiprocessing.Queue()
+    self.reports: dict[int, dict] = {}
+    """Last stats reported by each worker process, their counters are kept after it dies."""
+    self.restarts = 0
+
+  def start(self):
+    """Starts all the workers."""
+    for idx in range(len(self.workers)):
+      self.spawn(idx)
+
+  def spawn(self, idx: int):
+    process = multiprocessing.Process(target=self.target, args=(*self.workers[idx], self.stats_queue), name=f"worker-{idx}")
+    process.start()
+    self.processes[idx] = process
+    print(f"Started worker {process.pid} ({process.name})")
+
+  def poll(self, timeout: float = None):
+    """Waits up to `timeout` for a worker to die, restarts the dead ones and collects pending reports."""
+    multiprocessing.connection.wait([process.sentinel for process in self.processes], timeout)
+    dead = [idx for idx, process in enumerate(self.processes) if not process.is_alive()]
+    if dead:
+      time.sleep(RESTART_DELAY)
+    for idx in dead:
+      process = self.processes[idx]
+      print(f"Worker {process.pid} ({process.name}) exited with code {process.exitcode}, restarting")
+      self.restarts += 1
+      self.spawn(idx)
+    while True:
+      try:
+        pid, snapshot = self.stats_queue.get_nowait()
+      except queue.Empty:
+        break
+      self.reports[pid] = snapshot
+
+  def stats(self):
+    """Stats summed over all the workers, gauges and settings over the live ones."""
+    live = {process.pid for process in self.processes if process.is_alive()}
+    total = {"workers": len(live), "restarts": self.restarts}
+    for pid, snapshot in self.reports.items():
+      merge_stats(total, snapshot if pid in live else counters(snapshot))
+    return total
+
+  def stop(self):
+    """Terminates the workers."""
+    for process in self.processes:
+      process.terminate()
+    for process in self.processes:
+      process.join()
+
+  def run(self, interval: float = STATS_INTERVAL):
+    """Supervises the workers until interrupted, printing their stats every `interval` seconds."""
+    self.start()
+    try:
+      while True:
+        deadline = time.monotonic() + interval
+        while (remaining := deadline - time.monotonic()) > 0:
+          self.poll(remaining)
+        print(f"Stats: {self.stats()}")
+    except KeyboardInterrupt:
+      pass
+    finally:
+      self.stop()
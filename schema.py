@@ -0,0 +1,45 @@
+from typing import NamedTuple, get_type_hints
+from data import is_list
+
+REST_FIELD = "rest"
+"""Name of a trailing `list` field collecting the elements past the declared layout."""
+
+CONVERTERS = {
+  int: int
+}
+"""Conversions of string-encoded values by field annotation, other values are kept as-is."""
+
+def extractor(layout: type[NamedTuple]):
+  """Compiles a positional `NamedTuple` layout into a function reading a data list into a layout record.
+
+  Fields with defaults are an optional tail, a trailing `rest` field collects the remaining elements. Raises `ValueError` on arity mismatch or invalid values."""
+  name = layout.__name__
+  hints = get_type_hints(layout)
+  fields = layout._fields
+  has_rest = len(fields) > 0 and fields[-1] == REST_FIELD
+  size = len(fields) - has_rest
+  defaults = tuple(layout._field_defaults.get(field) for field in fields[:size])
+  required = size - sum(field in layout._field_defaults for field in fields[:size])
+  converters = tuple((idx, CONVERTERS[hints[field]]) for idx, field in enumerate(fields[:size]) if hints[field] in CONVERTERS)
+  new = tuple.__new__
+
+  def extract(values: list):
+    if not is_list(values):
+      raise TypeError(f"{name} expects a list, got {type(values).__name__}.")
+    count = len(values)
+    if count < required or (count > size and not has_rest):
+      raise ValueError(f"{name} expects {required if required == size else f'{required}-{size}'} elements, got {count}.")
+    args = values[:size]
+    try:
+      for idx, convert in converters:
+        if idx < count:
+          args[idx] = convert(args[idx])
+    except ValueError as err:
+      raise ValueError(f"{name}.{fields[idx]}: {err}") from None
+    if count < size:
+      args.extend(defaults[count:])
+    if has_rest:
+      args.append(values[size:])
+    return new(layout, args)
+
+  return extract
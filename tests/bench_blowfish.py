@@ -0,0 +1,43 @@
+import sys, os, random, time
+# relative module import stuff
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_dir)
+import blowfish
+from blowfish import Blowfish, FastBlowfish, Cipher
+
+SIZES = [16, 256, 4096, 0xFFF8]
+"""Payload sizes in bytes."""
+
+MIN_DURATION = 0.5
+"""Minimal measurement time per case in seconds."""
+
+def measure(fn, data: bytes):
+  """Returns throughput of `fn(data)` in MB/s."""
+  runs = 0
+  start = time.perf_counter()
+  elapsed = 0.0
+  while elapsed < MIN_DURATION:
+    fn(data)
+    runs += 1
+    elapsed = time.perf_counter() - start
+  return runs * len(data) / elapsed / 1e6
+
+def main():
+  rng = random.Random(0)
+  key = rng.randbytes(16)
+  ciphers = [Cipher(key, engine) for engine in (Blowfish, FastBlowfish)]
+  numpy = blowfish.HAS_NUMPY
+  print(f"{'size':>8} {'op':>8} {'Blowfish':>14} {'FastBlowfish':>14} {'NumPy':>14}")
+  for size in SIZES:
+    data = rng.randbytes(size)
+    enc = ciphers[0].encrypt(data)
+    for op, buf in (("encrypt", data), ("decrypt", enc)):
+      # scalar engines
+      blowfish.HAS_NUMPY = False
+      results = [f"{measure(getattr(cipher, op), buf):>9.3f} MB/s" for cipher in ciphers]
+      blowfish.HAS_NUMPY = numpy
+      results.append(f"{measure(getattr(ciphers[1], op), buf):>9.3f} MB/s" if numpy else f"{'n/a':>14}")
+      print(f"{size:>8} {op:>8} {' '.join(results)}")
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,51 @@
+import sys, os, random, time
+# relative module import stuff
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_dir)
+import gsxor
+
+SIZES = [16, 64, 256, 1024, 4096, 16384, 65536]
+"""Payload sizes in bytes."""
+
+MIN_DURATION = 0.2
+"""Minimal measurement time per case in seconds."""
+
+def mask_loop(input: bytes):
+  """Reference per-byte XOR loop."""
+  result = bytearray(input)
+  for i in range(len(result)):
+    result[i] ^= (i - 119) & 0xff
+  return bytes(result)
+
+def measure(fn, data: bytes):
+  """Returns mean time of `fn(data)` in microseconds."""
+  runs = 0
+  start = time.perf_counter()
+  elapsed = 0.0
+  while elapsed < MIN_DURATION:
+    fn(data)
+    runs += 1
+    elapsed = time.perf_counter() - start
+  return elapsed / runs * 1e6
+
+def main():
+  rng = random.Random(0)
+  numpy = gsxor.HAS_NUMPY
+  print(f"{'size':>8} {'loop':>12} {'int':>12} {'NumPy':>12}")
+  for size in SIZES:
+    data = rng.randbytes(size)
+    assert gsxor.mask(data) == mask_loop(data)
+    results = [f"{measure(mask_loop, data):>9.2f} us"]
+    gsxor.HAS_NUMPY = False
+    results.append(f"{measure(gsxor.mask, data):>9.2f} us")
+    gsxor.HAS_NUMPY = numpy
+    if numpy:
+      gsxor.NUMPY_MIN_SIZE, min_size = 0, gsxor.NUMPY_MIN_SIZE
+      results.append(f"{measure(gsxor.mask, data):>9.2f} us")
+      gsxor.NUMPY_MIN_SIZE = min_size
+    else:
+      results.append(f"{'n/a':>12}")
+    print(f"{size:>8} {' '.join(results)}")
+
+if __name__ == '__main__':
+  main()
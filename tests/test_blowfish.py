@@ -1,8 +1,9 @@
-import sys, os, unittest
+import sys, os, random, tempfile, unittest
 # relative module import stuff
 root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(root_dir)
-from blowfish import Blowfish, Cipher
+import blowfish, bfschedule
+from blowfish import Blowfish, FastBlowfish, Cipher, get_cipher
 
 class BlowfishTests(unittest.TestCase):
   """Tests for Blowfish encryption algorithm."""
@@ -23,5 +24,76 @@ class BlowfishTests(unittest.TestCase):
     dec = cipher.decrypt(enc)
     self.assertEqual(dec, DATA)
 
+  def test_fast_bf(self):
+    rng = random.Random(5)
+    for _ in range(10):
+      key = rng.randbytes(rng.randint(1, 56))
+      ref = Blowfish(key)
+      fast = FastBlowfish(key)
+      self.assertEqual(fast.P, ref.P)
+      self.assertEqual(fast.S, [nb for box in ref.S for nb in box])
+      for _ in range(100):
+        L = rng.getrandbits(32)
+        R = rng.getrandbits(32)
+        self.assertEqual(fast.encrypt(L, R), ref.encrypt(L, R))
+        self.assertEqual(fast.decrypt(L, R), ref.decrypt(L, R))
+
+  def test_cipher_engines(self):
+    rng = random.Random(6)
+    key = rng.randbytes(16)
+    ref = Cipher(key, Blowfish)
+    fast = Cipher(key, FastBlowfish)
+    for size in range(1, 100):
+      data = rng.randbytes(size)
+      enc = ref.encrypt(data)
+      self.assertEqual(fast.encrypt(data), enc)
+      self.assertEqual(fast.decrypt(enc), data)
+
+  def test_cipher_cache(self):
+    get_cipher.cache_clear()
+    key = b"0123456789ABCDEF"
+    cipher = get_cipher(key)
+    self.assertIs(get_cipher(key), cipher)
+    self.assertIsNot(get_cipher(b"FEDCBA9876543210"), cipher)
+    info = get_cipher.cache_info()
+    self.assertEqual((info.hits, info.misses), (1, 2))
+
+  @unittest.skipUnless(blowfish.HAS_NUMPY, "NumPy is not installed")
+  def test_cipher_numpy(self):
+    rng = random.Random(7)
+    cipher = Cipher(rng.randbytes(16))
+    data = [rng.randbytes(size) for size in (1, 8, 255, 256, 1000, 4099)]
+    numpy = blowfish.HAS_NUMPY
+    try:
+      blowfish.HAS_NUMPY = False
+      ref_enc = [cipher.encrypt(buf) for buf in data]
+      ref_dec = [cipher.decrypt(buf) for buf in ref_enc]
+    finally:
+      blowfish.HAS_NUMPY = numpy
+    self.assertEqual([cipher.encrypt(buf) for buf in data], ref_enc)
+    self.assertEqual([cipher.decrypt(buf) for buf in ref_enc], ref_dec)
+    self.assertEqual(cipher.encrypt_many(data), ref_enc)
+    self.assertEqual(cipher.decrypt_many(ref_enc), ref_dec)
+
+  def test_schedule_snapshots(self):
+    for key, path in bfschedule.SNAPSHOTS:
+      ref = Blowfish(key)
+      for engine in (Blowfish, FastBlowfish):
+        bf = blowfish.load_schedule(key, path, engine)
+        self.assertIsNotNone(bf, f"Missing or stale snapshot {path}, run bfschedule.py")
+        self.assertEqual(bf.P, ref.P)
+        self.assertEqual(bf.encrypt(1, 2), ref.encrypt(1, 2))
+        self.assertEqual(bf.decrypt(1, 2), ref.decrypt(1, 2))
+
+  def test_schedule_stale(self):
+    with tempfile.TemporaryDirectory() as dir:
+      path = os.path.join(dir, 'test.bin')
+      self.assertIsNone(blowfish.load_schedule(b"TESTKEY", path))
+      blowfish.save_schedule(b"TESTKEY", path)
+      self.assertIsNotNone(blowfish.load_schedule(b"TESTKEY", path))
+      self.assertIsNone(blowfish.load_schedule(b"OTHERKEY", path))
+      cipher = Cipher(b"OTHERKEY", snapshot=path)
+      self.assertEqual(cipher.bf.P, FastBlowfish(b"OTHERKEY").P)
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,59 @@
+import sys, os, socket, threading, unittest
+# relative module import stuff
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_dir)
+import client
+
+class TcpClientTests(unittest.TestCase):
+  """Tests for coalesced TCP sends."""
+  def setUp(self):
+    self.sv_sock, self.clt_sock = socket.socketpair()
+    self.clt = client.TcpClient((self.sv_sock, None))
+
+  def tearDown(self):
+    self.sv_sock.close()
+    self.clt_sock.close()
+
+  def test_flush(self):
+    stats = client.send_stats()
+    buf = bytearray(b'frame')
+    self.clt.send(b'res')
+    self.clt.send(memoryview(buf))
+    self.clt.send(b'notif')
+    buf[:] = b'xxxxx'
+    self.clt.flush()
+    self.clt.flush()
+    self.assertEqual(self.clt_sock.recv(64), b'resframenotif')
+    self.assertEqual(client.send_stats()["saved"] - stats["saved"], 2)
+
+  def test_flush_many(self):
+    msgs = [bytes([i]) * 10 for i in range(client.SENDMSG_MAX_BUFFERS + 1)]
+    for msg in msgs:
+      self.clt.send(msg)
+    self.clt.flush()
+    data = b''
+    while len(data) < 10 * len(msgs):
+      data += self.clt_sock.recv(4096)
+    self.assertEqual(data, b''.join(msgs))
+
+  def test_concurrent_stats(self):
+    class NullConn:
+      def sendall(self, data: bytes):
+        pass
+
+    def flush_many():
+      clt = client.TcpClient((NullConn(), None))
+      for _ in range(1000):
+        clt.send(b'res')
+        clt.flush()
+
+    stats = client.send_stats()
+    threads = [threading.Thread(target=flush_many) for _ in range(8)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(client.send_stats()["messages"] - stats["messages"], 8000)
+
+if __name__ == '__main__':
+  unittest.main()
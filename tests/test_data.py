@@ -2,7 +2,7 @@ import sys, os, unittest
 # relative module import stuff
 root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(root_dir)
-from data import List, Bin
+from data import List, Bin, String, Long, StreamDecoder, LazyList
 
 class DataTests(unittest.TestCase):
   """Tests for data parsing and other utilities."""
@@ -34,5 +34,100 @@ class DataTests(unittest.TestCase):
     bin = Bin.from_buf(bytearray(input))
     self.assertEqual(bin.bts, b'Hello')
 
+  def test_serialize_long(self):
+    self.assertEqual(bytes(Long(258)), b'L\x00\x00\x01\x02')
+    self.assertEqual(List([-1, ['1', 7]]).to_buf(), b'L\xff\xff\xff\xff[s1\x00L\x00\x00\x00\x07]')
+
+  def test_deserialize_long(self):
+    input = bytearray(b'L\xff\xff\xff\xfe[L\x00\x00\x00\x07]')
+    self.assertEqual(Long.from_buf(input).value, -2)
+    self.assertEqual(List.from_buf(bytes(input), False).lst, [7])
+    self.assertEqual(List.from_buf(b'L\x00\x00\x00\x07s1\x00', lazy=True).lst, [7, '1'])
+    self.assertEqual(StreamDecoder().feed(b'L\x00\x00\x00\x07L\x00'), [7])
+
+  def test_deserialize_nested_dl(self):
+    blob = bytes(range(256)) * 16
+    input = bytearray(List([['1', blob, ['abc', []]], 'x']).to_buf())
+    list = List.from_buf(input)
+    self.assertEqual(list.lst, [['1', blob, ['abc', []]], 'x'])
+    self.assertEqual(input, bytearray())
+
+  def test_deserialize_consume(self):
+    input = bytearray(b's1\x00[s2\x00]s3\x00')
+    self.assertEqual(String.from_buf(input).string, '1')
+    self.assertEqual(List.from_buf(input, False).lst, ['2'])
+    self.assertEqual(input, bytearray(b's3\x00'))
+    self.assertEqual(List.from_buf(bytes(input)).lst, ['3'])
+
+  def test_serialize_nested_dl(self):
+    list = List(['1', [b'\x01', ['2']], []])
+    self.assertEqual(list.to_buf(), b's1\x00[b\x00\x00\x00\x01\x01[s2\x00]][]')
+    self.assertEqual(bytes(list), b'[' + list.to_buf() + b']')
+
+  def test_serialize_unsupported(self):
+    self.assertRaises(BufferError, List([1.0]).to_buf)
+
+  def test_deserialize_zero_copy(self):
+    input = bytearray(List(['1', b'Hello', [b'World']]).to_buf())
+    list = List.from_buf(input, zero_copy=True)
+    self.assertIsInstance(list.lst[1], memoryview)
+    self.assertTrue(list.lst[1].readonly)
+    self.assertEqual(list.lst[1], b'Hello')
+    self.assertEqual(len(input), 25)
+    self.assertEqual(List(list.lst).to_buf(), bytes(input))
+    self.assertEqual(list.materialize().lst, ['1', b'Hello', [b'World']])
+    self.assertIs(type(list.lst[2][0]), bytes)
+
+  def test_stream_decoder(self):
+    lst = ['1', [b'Hello', ['2', []]], b'World' * 100, '']
+    input = List(lst).to_buf()
+    decoder = StreamDecoder()
+    output = []
+    for pos in range(0, len(input), 7):
+      output.extend(decoder.feed(input[pos:pos + 7]))
+      self.assertLessEqual(decoder.pending(), 505)
+    self.assertEqual(output, lst)
+    self.assertEqual(decoder.pending(), 0)
+
+  def test_stream_decoder_partial(self):
+    decoder = StreamDecoder()
+    self.assertEqual(decoder.feed(b's1\x00[s2'), ['1'])
+    self.assertEqual(decoder.feed(b'\x00'), [])
+    self.assertEqual(decoder.feed(b']b\x00\x00'), [['2']])
+    self.assertEqual(decoder.pending(), 3)
+    self.assertRaises(BufferError, StreamDecoder().feed, b']')
+
+  def test_stream_decoder_unused_result(self):
+    decoder = StreamDecoder()
+    decoder.feed(b's1\x00[s')
+    self.assertEqual(decoder.pending(), 2)
+    decoder.feed(b'2\x00')
+    self.assertEqual(decoder.feed(b']'), [['2']])
+    self.assertEqual(decoder.pending(), 0)
+
+  def test_deserialize_lazy(self):
+    lst = ['1', [b'Hello', ['2', []]], b'World', '']
+    input = List(lst).to_buf()
+    list = List.from_buf(input, lazy=True)
+    self.assertIsInstance(list.lst, LazyList)
+    self.assertEqual(list.lst.values, [None] * 4)
+    self.assertEqual(list.lst[-2], b'World')
+    self.assertEqual(list.lst.values[:2], [None, None])
+    self.assertIsInstance(list.lst[1], LazyList)
+    self.assertEqual(len(list.lst), 4)
+    self.assertEqual(list.lst, lst)
+    self.assertEqual(list.lst[1:], lst[1:])
+    self.assertEqual(List(['x', list.lst[1]]).to_buf(), List(['x', lst[1]]).to_buf())
+    self.assertEqual(list.to_buf(), input)
+
+  def test_lazy_repr(self):
+    input = List(['1', [b'Hello'], b'World']).to_buf()
+    list = List.from_buf(input, lazy=True)
+    self.assertEqual(str(list), f"<LazyList 3 elements, {len(input)}B: [..., ..., ...]>")
+    self.assertEqual(list.lst.values, [None] * 3)
+    list.lst[2]
+    list.lst[1]
+    self.assertEqual(str(list), f"<LazyList 3 elements, {len(input)}B: [..., <LazyList 1 elements, 10B: [...]>, b'World']>")
+
 if __name__ == '__main__':
   unittest.main()
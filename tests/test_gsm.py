@@ -0,0 +1,133 @@
+import sys, os, unittest
+# relative module import stuff
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_dir)
+import gsm
+from gsclient import request
+from data import List
+
+class Connection:
+  """Socket stub returning the data in fixed-size chunks."""
+  def __init__(self, data: bytes, chunk: int):
+    self.data = data
+    self.chunk = chunk
+
+  def recv_into(self, buf: memoryview):
+    size = min(len(buf), self.chunk, len(self.data))
+    buf[:size] = self.data[:size]
+    self.data = self.data[size:]
+    return size
+
+class HeaderTests(unittest.TestCase):
+  """Tests for GS message headers."""
+  def test_header_roundtrip(self):
+    input = bytes([0x01, 0x02, 0x03, 0x81, 0xD1, 0x24])
+    header = gsm.GSMessageHeader(b'\xff' + input, 1)
+    self.assertEqual(header.size, 0x010203)
+    self.assertEqual(header.property, gsm.PROPERTY.GS_ENCRYPT)
+    self.assertEqual(header.priority, 1)
+    self.assertEqual(header.type, gsm.MESSAGE_TYPE.LOBBY_MSG)
+    self.assertEqual((header.sender, header.receiver), (gsm.SENDER_RECEIVER.S, gsm.SENDER_RECEIVER.P))
+    self.assertEqual(bytes(header), input)
+    out = bytearray(8)
+    header.write_into(out, 2)
+    self.assertEqual(out[2:], input)
+
+  def test_header_from_params(self):
+    header = gsm.GSMessageHeader.from_params(gsm.PROPERTY.GS, 1, gsm.MESSAGE_TYPE.LOBBY_MSG, gsm.SENDER_RECEIVER.S, gsm.SENDER_RECEIVER.P)
+    self.assertEqual(bytes(header), bytes([0, 0, 0, 0x01, 0xD1, 0x24]))
+
+  def test_header_invalid(self):
+    self.assertRaises(ValueError, gsm.GSMessageHeader, bytes([0, 0, 6, 0xC0, 0xD1, 0x24]))
+    self.assertRaises(ValueError, gsm.GSMessageHeader, bytes([0, 0, 6, 0x00, 0x00, 0x24]))
+    self.assertRaises(ValueError, gsm.GSMessageHeader, bytes([0, 0, 6, 0x00, 0xD1, 0xF4]))
+
+class FramerTests(unittest.TestCase):
+  """Tests for GS message framing."""
+  def test_recv_frames(self):
+    msgs = [request(gsm.MESSAGE_TYPE.LOGIN, ['user']), request(gsm.MESSAGE_TYPE.STILLALIVE, [b'x' * 10000])]
+    conn = Connection(b''.join(msgs) * 3, 700)
+    framer = gsm.Framer(64)
+    frames = []
+    while framer.recv(conn):
+      for frame in framer.frames():
+        self.assertIsInstance(frame, memoryview)
+        frames.append(bytes(frame))
+    self.assertEqual(frames, msgs * 3)
+
+  def test_feed_messages(self):
+    data = request(gsm.MESSAGE_TYPE.LOGIN, ['user']) + request(gsm.MESSAGE_TYPE.LOBBY_MSG, ['24', ['1000']])
+    framer = gsm.Framer()
+    framer.feed(data[:10])
+    self.assertEqual(list(framer.frames()), [])
+    framer.feed(data[10:])
+    reqs = [gsm.Message(None, in_buf=frame) for frame in framer.frames()]
+    self.assertEqual([req.header.type for req in reqs], [gsm.MESSAGE_TYPE.LOGIN, gsm.MESSAGE_TYPE.LOBBY_MSG])
+    self.assertEqual(reqs[1].dl.lst, ['24', ['1000']])
+
+  def test_invalid_size(self):
+    framer = gsm.Framer()
+    framer.feed(bytes(8))
+    self.assertRaises(BufferError, list, framer.frames())
+
+  def test_max_size(self):
+    framer = gsm.Framer(max_size=1000)
+    framer.feed(request(gsm.MESSAGE_TYPE.STILLALIVE, [b'x' * 2000])[:64])
+    self.assertRaises(BufferError, list, framer.frames())
+    # not grown for the rejected message
+    self.assertEqual(len(framer.buf), gsm.FRAMER_BUFFER_SIZE)
+
+class TemplateTests(unittest.TestCase):
+  """Tests for cached constant responses."""
+  def request(self, priority: int, sender: gsm.SENDER_RECEIVER):
+    header = gsm.GSMessageHeader.from_params(gsm.PROPERTY.GS, priority, gsm.MESSAGE_TYPE.LOGIN, sender, gsm.SENDER_RECEIVER.S)
+    return gsm.Message(None, header=header, dl=List(['user']))
+
+  def test_template_header(self):
+    gsm.TEMPLATES.clear()
+    first = bytes(gsm.LoginResponse(self.request(1, gsm.SENDER_RECEIVER.P)))
+    self.assertIn((gsm.LoginResponse,), gsm.TEMPLATES)
+    res = gsm.LoginResponse(self.request(5, gsm.SENDER_RECEIVER.R))
+    cached = bytes(res)
+    res.template = None
+    self.assertEqual(cached, bytes(res))
+    self.assertEqual(cached[6:], first[6:])
+    self.assertEqual((cached[3], cached[5]), (5, 0x21))
+
+class LazyMessageTests(unittest.TestCase):
+  """Tests for lazily decoded payloads."""
+  def test_print_undecoded(self):
+    lst = [str(gsm.LOBBY_MSG.JOIN_ROOM.value), ['1000', b'x' * 100]]
+    req = gsm.Message(None, in_buf=request(gsm.MESSAGE_TYPE.LOBBY_MSG, lst))
+    self.assertIn("2 elements", str(req))
+    self.assertEqual(req.dl.lst.values, [None, None])
+    self.assertEqual(req.dl.lst, lst)
+
+class RegistryTests(unittest.TestCase):
+  """Tests for request handler dispatch."""
+  def test_dispatch(self):
+    registry = gsm.Registry()
+    registry.add(gsm.MESSAGE_TYPE.STILLALIVE, gsm.handle_still_alive)
+
+    @registry.handler(gsm.MESSAGE_TYPE.LOBBY_MSG, gsm.LOBBY_MSG.JOIN_ROOM)
+    def handle_join_room(clt, req):
+      return gsm.lobby_args(req).group_id
+
+    lobby_msg = gsm.Message(None, in_buf=request(gsm.MESSAGE_TYPE.LOBBY_MSG, ['24', ['1000', '', '1', '0', '']]))
+    still_alive = gsm.Message(None, in_buf=request(gsm.MESSAGE_TYPE.STILLALIVE, []))
+    self.assertEqual(registry.dispatch(None, lobby_msg), 1000)
+    self.assertIsNone(registry.dispatch(None, still_alive))
+    self.assertIsNone(registry.dispatch(None, still_alive))
+    stats = registry.stats()
+    self.assertEqual(stats["STILLALIVE"].calls, 2)
+    self.assertEqual(stats["LOBBY_MSG.JOIN_ROOM"].calls, 1)
+
+  def test_dispatch_unknown(self):
+    registry = gsm.Registry()
+    registry.add(gsm.MESSAGE_TYPE.STILLALIVE, gsm.handle_still_alive)
+    self.assertRaises(ValueError, registry.add, gsm.MESSAGE_TYPE.STILLALIVE, gsm.handle_still_alive)
+    lobby_msg = gsm.Message(None, in_buf=request(gsm.MESSAGE_TYPE.LOBBY_MSG, ['24', []]))
+    self.assertRaises(NotImplementedError, registry.dispatch, None, lobby_msg)
+
+if __name__ == '__main__':
+  unittest.main()
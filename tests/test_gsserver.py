@@ -0,0 +1,110 @@
+import sys, os, asyncio, unittest
+# relative module import stuff
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_dir)
+import blowfish, gsm, gsserver, pkc
+from gsclient import request, read_message
+
+class GSServerTests(unittest.IsolatedAsyncioTestCase):
+  """Tests for the asyncio GS service core."""
+  async def asyncSetUp(self):
+    self.handlers = gsm.Registry()
+    self.handlers.add(gsm.MESSAGE_TYPE.STILLALIVE, gsm.handle_still_alive)
+    self.handlers.add(gsm.MESSAGE_TYPE.LOGIN, lambda clt, req: gsm.LoginResponse(req))
+    self.handlers.add(gsm.MESSAGE_TYPE.LOGINFRIENDS, lambda clt, req: gsm.LoginFriendsResponse(req), offload=True)
+    self.handlers.add(gsm.MESSAGE_TYPE.KEY_EXCHANGE, gsm.handle_key_exchange, coroutine=gsm.handle_key_exchange_async)
+    self.clients = []
+    loop = asyncio.get_running_loop()
+    self.server = await loop.create_server(lambda: gsserver.GSProtocol(self.handlers, self.clients), '127.0.0.1', 0)
+    self.address = self.server.sockets[0].getsockname()
+
+  async def asyncTearDown(self):
+    self.server.close()
+    await self.server.wait_closed()
+
+  async def test_sessions(self):
+    data = request(gsm.MESSAGE_TYPE.STILLALIVE, []) + request(gsm.MESSAGE_TYPE.LOGIN, ['user']) + request(gsm.MESSAGE_TYPE.LOGINFRIENDS, [])
+    sessions = [await asyncio.open_connection(*self.address) for _ in range(3)]
+    for reader, writer in sessions:
+      # messages split across segments
+      writer.write(data[:9])
+      await writer.drain()
+      await asyncio.sleep(0.01)
+      writer.write(data[9:])
+    for reader, writer in sessions:
+      login = await asyncio.wait_for(read_message(reader), 5)
+      friends = await asyncio.wait_for(read_message(reader), 5)
+      self.assertEqual((login.header.type, login.dl.lst), (gsm.MESSAGE_TYPE.GSSUCCESS, [bytes([gsm.MESSAGE_TYPE.LOGIN.value])]))
+      self.assertEqual(friends.dl.lst, [bytes([gsm.MESSAGE_TYPE.LOGINFRIENDS.value])])
+    self.assertEqual(len(self.clients), 3)
+    for reader, writer in sessions:
+      writer.close()
+      await writer.wait_closed()
+    await asyncio.sleep(0.05)
+    self.assertEqual(self.clients, [])
+    self.assertEqual(self.handlers.stats()["LOGIN"].calls, 3)
+
+  async def test_backpressure(self):
+    released = asyncio.Event()
+    async def wait_released(clt, req):
+      await released.wait()
+    self.handlers.add(gsm.MESSAGE_TYPE.PING, lambda clt, req: None, coroutine=wait_released)
+    ping = request(gsm.MESSAGE_TYPE.PING, [])
+    reader, writer = await asyncio.open_connection(*self.address)
+    try:
+      writer.write(ping * (gsserver.QUEUE_HIGH_WATER + 1))
+      await writer.drain()
+      await asyncio.sleep(0.05)
+      transport = self.clients[0].conn.transport
+      self.assertFalse(transport.is_reading())
+      released.set()
+      # requests without a response are echoed
+      for _ in range(gsserver.QUEUE_HIGH_WATER + 1):
+        await asyncio.wait_for(read_message(reader), 5)
+      self.assertTrue(transport.is_reading())
+    finally:
+      writer.close()
+      await writer.wait_closed()
+
+  async def test_key_exchange(self):
+    game_pubkey, game_privkey = pkc.keygen()
+    game_key = bytes(pkc.RsaPublicKey.from_pubkey(game_pubkey))
+    reader, writer = await asyncio.open_connection(*self.address)
+    try:
+      writer.write(request(gsm.MESSAGE_TYPE.KEY_EXCHANGE, ['1', ['1', str(len(game_key)), game_key]]))
+      res = await asyncio.wait_for(read_message(reader), 30)
+      sv_pubkey = pkc.RsaPublicKey.from_buf(bytes(res.dl.lst[1][2])).to_pubkey()
+      bf_key = blowfish.Cipher.keygen(16)
+      enc_key = pkc.encrypt(bf_key, sv_pubkey)
+      writer.write(request(gsm.MESSAGE_TYPE.KEY_EXCHANGE, ['2', ['1', str(len(enc_key)), enc_key]]))
+      await asyncio.wait_for(read_message(reader), 30)
+      # the coroutine variant ran on the loop, timed like other handlers
+      self.assertEqual(self.clients[0].game_bf_key, bf_key)
+      self.assertEqual(self.handlers.stats()["KEY_EXCHANGE"].calls, 2)
+    finally:
+      writer.close()
+      await writer.wait_closed()
+
+class DatagramTests(unittest.IsolatedAsyncioTestCase):
+  """Tests for the UDP service endpoint."""
+  async def test_datagrams(self):
+    def handler(data: bytes, address: tuple[str, int], sendto):
+      if data == b'fail':
+        raise NotImplementedError("Unsupported request")
+      sendto(data[::-1], address)
+
+    loop = asyncio.get_running_loop()
+    server, _ = await loop.create_datagram_endpoint(lambda: gsserver.DatagramProtocol(handler), local_addr=('127.0.0.1', 0))
+    received = asyncio.Queue()
+    client, _ = await loop.create_datagram_endpoint(lambda: gsserver.DatagramProtocol(lambda data, address, sendto: received.put_nowait(data)), remote_addr=server.get_extra_info('sockname'))
+    try:
+      # handler errors do not stop the endpoint
+      for data in [b'fail', b'ping']:
+        client.sendto(data)
+      self.assertEqual(await asyncio.wait_for(received.get(), 5), b'gnip')
+    finally:
+      client.close()
+      server.close()
+
+if __name__ == '__main__':
+  unittest.main()
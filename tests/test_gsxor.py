@@ -1,4 +1,4 @@
-import sys, os, unittest
+import sys, os, hashlib, unittest
 # relative module import stuff
 root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(root_dir)
@@ -38,5 +38,57 @@ class GSXORTests(unittest.TestCase):
     dec = gsxor.decrypt(enc)
     self.assertEqual(data, dec)
 
+  def test_gsxor_sizes(self):
+    for size in range(300):
+      data = bytes(i * 7 & 0xff for i in range(size))
+      enc = gsxor.encrypt(data)
+      self.assertEqual(len(enc), size)
+      self.assertEqual(gsxor.decrypt(enc), data)
+
+  def test_gsxor_known_answers(self):
+    # output of the original per-byte implementation
+    vectors = {
+      1: bytes.fromhex("89"),
+      17: bytes.fromhex("8985adadf58d91a9cd99a1c1a5d9e9d5f1")
+    }
+    digests = {
+      255: "1ad956951dccbd91096e6c53ac164137a88b2c89ab909cd8681112064e3692c8",
+      256: "c74fdae823d19dac5edfae1578c14afef2127f4c1c986c62b0f6241947614bd2",
+      257: "c97e5e2bdd53f9e4604c713cba4287b37d5ffa2a4391f59406ce1d4a469a0906",
+      600: "3c7d2cd47a39e298fcd23310fd68bc54188f73d7a0844e5f9b8526e12a8edf76",
+      1500: "43fcbdc2b7a00824fff8b87bb45f3e7795945e5a0cfaaaf4bccd30a2f3a5b170"
+    }
+    has_numpy = gsxor.HAS_NUMPY
+    try:
+      # both mask implementations
+      for use_numpy in (False, has_numpy):
+        gsxor.HAS_NUMPY = use_numpy
+        for size, expected in vectors.items():
+          data = bytes(i * 7 & 0xff for i in range(size))
+          self.assertEqual(gsxor.encrypt(data), expected)
+          self.assertEqual(gsxor.decrypt(expected), data)
+        for size, digest in digests.items():
+          data = bytes(i * 7 & 0xff for i in range(size))
+          self.assertEqual(hashlib.sha256(gsxor.encrypt(data)).hexdigest(), digest)
+    finally:
+      gsxor.HAS_NUMPY = has_numpy
+
+  def test_gsxor_memoryview(self):
+    data = b'abcdefghijklmnopqASDASDrstuvwxyz'
+    enc = gsxor.encrypt(data)
+    self.assertEqual(gsxor.encrypt(memoryview(data)), enc)
+    self.assertEqual(gsxor.decrypt(memoryview(enc)), data)
+    self.assertEqual(gsxor.decrypt(memoryview(b'xx' + enc)[2:]), data)
+
+  def test_permutation_cache_bytes(self):
+    gsxor.permutation(60000)
+    self.assertLessEqual(gsxor.permutations_bytes, gsxor.PERMUTATION_CACHE_BYTES)
+    for size in range(100000, 100000 + 2 * gsxor.PERMUTATION_CACHE_BYTES // 800000 + 2):
+      enc, dec = gsxor.permutation(size)
+      self.assertEqual(len(enc), size)
+    self.assertLessEqual(gsxor.permutations_bytes, gsxor.PERMUTATION_CACHE_BYTES)
+    self.assertNotIn(60000, gsxor.permutations)
+    self.assertEqual(gsxor.permutations_bytes, sum(8 * size for size in gsxor.permutations))
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,52 @@
+import sys, os, threading, time, unittest
+# relative module import stuff
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_dir)
+import pkc
+
+class KeyPoolTests(unittest.TestCase):
+  """Tests for pre-generated RSA keypair pool."""
+  def test_empty_pool(self):
+    pool = pkc.KeyPool(1)
+    pub_key, priv_key = pool.pop()
+    self.assertEqual(pkc.decrypt(pkc.encrypt(b'key', pub_key), priv_key), b'key')
+    self.assertEqual(pool.stats()["misses"], 1)
+
+  def test_refill(self):
+    pool = pkc.KeyPool(2)
+    pool.start()
+    deadline = time.monotonic() + 30
+    while pool.stats()["depth"] < 2 and time.monotonic() < deadline:
+      time.sleep(0.01)
+    self.assertEqual(pool.stats()["depth"], 2)
+    pool.pop()
+    stats = pool.stats()
+    self.assertEqual((stats["hits"], stats["misses"]), (1, 0))
+    self.assertGreater(stats["refill_rate"], 0)
+
+  def test_concurrent_pops(self):
+    pool = pkc.KeyPool(0)
+    for idx in range(400):
+      pool.keys.put((idx, idx))
+    threads = [threading.Thread(target=lambda: [pool.pop() for _ in range(50)]) for _ in range(8)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual((pool.stats()["hits"], pool.stats()["depth"]), (400, 0))
+
+class OffloadTests(unittest.TestCase):
+  """Tests for RSA operations in the process pool."""
+  def test_decrypt_async(self):
+    pub_key, priv_key = pkc.keygen_async().result()
+    enc = pkc.encrypt(b'0123456789ABCDEF', pub_key)
+    calls = pkc.TIMINGS["decrypt"].calls
+    self.assertEqual(pkc.decrypt_async(enc, priv_key).result(), b'0123456789ABCDEF')
+    # timings are recorded by a done callback, right after the result is set
+    deadline = time.monotonic() + 1
+    while pkc.TIMINGS["decrypt"].calls == calls and time.monotonic() < deadline:
+      time.sleep(0.01)
+    self.assertEqual(pkc.TIMINGS["decrypt"].calls, calls + 1)
+
+if __name__ == '__main__':
+  unittest.main()
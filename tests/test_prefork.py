@@ -0,0 +1,61 @@
+import sys, os, pickle, time, unittest
+# relative module import stuff
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_dir)
+import prefork
+from utils import OpTimer
+
+def timer(*elapsed: float):
+  op = OpTimer()
+  for value in elapsed:
+    op.record(value)
+  return op
+
+def crashing_worker(code: int, stats):
+  prefork.report(stats, {"sessions": 1, "key_pool": {"depth": 8, "watermark": 8}, "timings": {"LOGIN": timer(0.5)}})
+  # lets the queue feeder thread flush the report
+  stats.close()
+  stats.join_thread()
+  sys.exit(code)
+
+class StatsTests(unittest.TestCase):
+  """Tests for aggregation of worker stats."""
+  def test_merge(self):
+    total = {}
+    prefork.merge_stats(total, {"send": {"messages": 3}, "key_pool": {"watermark": 8, "refill_rate": 2.0}, "timings": {"LOGIN": timer(0.1, 0.3)}})
+    prefork.merge_stats(total, pickle.loads(pickle.dumps({"send": {"messages": 2, "saved": 1}, "key_pool": {"watermark": 8, "refill_rate": 1.5}, "timings": {"LOGIN": timer(0.2)}})))
+    self.assertEqual(total["send"], {"messages": 5, "saved": 1})
+    self.assertEqual(total["key_pool"], {"watermark": 8, "refill_rate": 3.5})
+    login = total["timings"]["LOGIN"]
+    self.assertEqual(login.calls, 3)
+    self.assertAlmostEqual(login.total, 0.6)
+    self.assertEqual(login.max, 0.3)
+
+  def test_counters(self):
+    snapshot = {"key_pool": {"depth": 3, "watermark": 8, "hits": 5}, "threads": {"pools": {"7777": {"threads": 4, "queued": 2, "refused": 1}}}}
+    self.assertEqual(prefork.counters(snapshot), {"key_pool": {"hits": 5}, "threads": {"pools": {"7777": {"refused": 1}}}})
+
+class SupervisorTests(unittest.TestCase):
+  """Tests for restarts of prefork workers."""
+  def test_restart(self):
+    supervisor = prefork.Supervisor(crashing_worker, [(1,), (2,)])
+    supervisor.start()
+    try:
+      deadline = time.monotonic() + 30
+      while supervisor.restarts < 2 and time.monotonic() < deadline:
+        supervisor.poll(1)
+      # the restarted workers crash too
+      for process in supervisor.processes:
+        process.join()
+      stats = supervisor.stats()
+      self.assertGreaterEqual(stats["restarts"], 2)
+      # reports of dead workers are kept
+      self.assertGreaterEqual(stats["sessions"], 2)
+      self.assertEqual(stats["sessions"], stats["timings"]["LOGIN"].calls)
+      # gauges of dead workers are dropped
+      self.assertEqual(stats["key_pool"], {})
+    finally:
+      supervisor.stop()
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,38 @@
+import sys, os, unittest
+# relative module import stuff
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_dir)
+from typing import NamedTuple
+import schema
+
+class Layout(NamedTuple):
+  id: int
+  name: str
+  info: bytes = b''
+
+class RestLayout(NamedTuple):
+  id: int
+  rest: list
+
+class SchemaTests(unittest.TestCase):
+  """Tests for compiled payload layouts."""
+  def test_extract(self):
+    extract = schema.extractor(Layout)
+    self.assertEqual(extract(['7', 'room', b'\x01']), Layout(7, 'room', b'\x01'))
+    self.assertEqual(extract(['7', 'room']), Layout(7, 'room', b''))
+    self.assertEqual(extract(['7', 'room']).id, 7)
+
+  def test_extract_rest(self):
+    extract = schema.extractor(RestLayout)
+    self.assertEqual(extract(['7']), RestLayout(7, []))
+    self.assertEqual(extract(['7', 'a', ['b']]), RestLayout(7, ['a', ['b']]))
+
+  def test_extract_invalid(self):
+    extract = schema.extractor(Layout)
+    self.assertRaises(ValueError, extract, ['7'])
+    self.assertRaises(ValueError, extract, ['7', 'room', b'', 'x'])
+    self.assertRaises(ValueError, extract, ['x', 'room'])
+    self.assertRaises(TypeError, extract, '7')
+
+if __name__ == '__main__':
+  unittest.main()
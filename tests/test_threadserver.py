@@ -0,0 +1,80 @@
+import sys, os, socket, threading, time, unittest
+# relative module import stuff
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root_dir)
+import gsm, threadserver
+from gsclient import request, recv_message
+
+class TimedLockTests(unittest.TestCase):
+  """Tests for lock hold time reporting."""
+  def test_contention(self):
+    lock = threadserver.TimedLock("test.contention")
+    counter = [0]
+
+    def work():
+      for _ in range(100):
+        with lock:
+          counter[0] += 1
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(counter[0], 400)
+    stats = threadserver.stats()["locks"]["test.contention"]
+    self.assertEqual((stats["wait"].calls, stats["hold"].calls), (400, 400))
+
+class PoolServerTests(unittest.TestCase):
+  """Tests for the thread pool GS service runner."""
+  def setUp(self):
+    self.handlers = gsm.Registry()
+    self.handlers.add(gsm.MESSAGE_TYPE.STILLALIVE, gsm.handle_still_alive)
+    self.handlers.add(gsm.MESSAGE_TYPE.LOGIN, lambda clt, req: gsm.LoginResponse(req))
+    self.clients = []
+
+  def start(self, threads: int, queue_size = threadserver.ACCEPT_QUEUE_SIZE):
+    server = threadserver.PoolServer(('127.0.0.1', 0), self.handlers.dispatch, self.clients, threads, queue_size)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    self.addCleanup(server.server_close)
+    self.addCleanup(server.shutdown)
+    return server
+
+  def test_sessions(self):
+    server = self.start(4)
+    sessions = [socket.create_connection(server.server_address, timeout=5) for _ in range(4)]
+    for sock in sessions:
+      sock.sendall(request(gsm.MESSAGE_TYPE.STILLALIVE, []) + request(gsm.MESSAGE_TYPE.LOGIN, ['user']))
+    for sock in sessions:
+      res = recv_message(sock)
+      self.assertEqual((res.header.type, res.dl.lst), (gsm.MESSAGE_TYPE.GSSUCCESS, [bytes([gsm.MESSAGE_TYPE.LOGIN.value])]))
+    # all sessions are served at once
+    self.assertEqual(len(self.clients), 4)
+    for sock in sessions:
+      sock.close()
+    deadline = time.monotonic() + 5
+    while self.clients and time.monotonic() < deadline:
+      time.sleep(0.01)
+    self.assertEqual(self.clients, [])
+
+  def test_accept_queue(self):
+    server = self.start(1, 1)
+    busy = socket.create_connection(server.server_address, timeout=5)
+    busy.sendall(request(gsm.MESSAGE_TYPE.LOGIN, ['user']))
+    recv_message(busy)
+    # waits for the only thread
+    queued = socket.create_connection(server.server_address, timeout=5)
+    deadline = time.monotonic() + 5
+    while server.stats()["queued"] < 1 and time.monotonic() < deadline:
+      time.sleep(0.01)
+    refused = socket.create_connection(server.server_address, timeout=5)
+    self.assertEqual(refused.recv(1), b'')
+    self.assertEqual(server.stats()["refused"], 1)
+    busy.close()
+    queued.sendall(request(gsm.MESSAGE_TYPE.LOGIN, ['user']))
+    self.assertEqual(recv_message(queued).header.type, gsm.MESSAGE_TYPE.GSSUCCESS)
+    queued.close()
+    refused.close()
+
+if __name__ == '__main__':
+  unittest.main()
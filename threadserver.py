@@ -0,0 +1,128 @@
+import queue, socketserver, threading, time
+import client, gsm
+from utils import OpTimer
+from typing import Callable
+
+POOL_SIZE = 16
+"""Default number of handler threads of a `PoolServer`."""
+
+ACCEPT_QUEUE_SIZE = 64
+"""Default number of accepted connections waiting for a handler thread, further ones are refused."""
+
+LOCKS: dict[str, "TimedLock"] = {}
+"""Locks guarding shared state, by name."""
+
+SERVERS: list["PoolServer"] = []
+"""Running pool servers."""
+
+class TimedLock:
+  """Mutex recording how long threads wait for it and hold it, reported by `stats`."""
+  def __init__(self, name: str):
+    self.name = name
+    self.wait = OpTimer()
+    self.hold = OpTimer()
+    self.__lock = threading.Lock()
+    self.__acquired = 0.0
+    LOCKS[name] = self
+
+  def __enter__(self):
+    start = time.perf_counter()
+    self.__lock.acquire()
+    self.__acquired = time.perf_counter()
+    self.wait.record(self.__acquired - start)
+    return self
+
+  def __exit__(self, *exc):
+    held = time.perf_counter() - self.__acquired
+    self.__lock.release()
+    self.hold.record(held)
+
+def stats():
+  """Pool metrics of the servers and wait and hold times of the used locks."""
+  return {
+    "pools": {str(server.server_address[1]): server.stats() for server in SERVERS},
+    "locks": {name: {"wait": lock.wait, "hold": lock.hold} for name, lock in LOCKS.items() if lock.hold.calls > 0}
+  }
+
+class GSRequestHandler(socketserver.BaseRequestHandler):
+  """Session of a GS TCP client, handled by a pool thread until disconnection."""
+  server: "PoolServer"
+
+  def handle(self):
+    server = self.server
+    clt = client.TcpClient((self.request, self.client_address))
+    with server.clients_lock:
+      server.clients.append(clt)
+    print(f"Connection from {clt.addr}")
+    framer = gsm.Framer()
+    try:
+      while framer.recv(clt.conn):
+        for frame in framer.frames():
+          req = gsm.Message(clt.sv_cipher, in_buf=frame)
+          print(req)
+          res = server.handle_req(clt, req)
+          if res:
+            print(res)
+            clt.send(bytes(res))
+          elif req.header.type != gsm.MESSAGE_TYPE.STILLALIVE:
+            clt.send(frame)
+        # responses to all received messages go out together
+        clt.flush()
+      print("No more data from", clt.addr)
+    finally:
+      with server.clients_lock:
+        server.clients.remove(clt)
+
+class PoolServer(socketserver.TCPServer):
+  """`ThreadingTCPServer` alternative serving a GS TCP service with a fixed pool of threads.
+
+  Accepted connections wait in a bounded queue for a free thread, the ones that don't fit are closed right away."""
+  allow_reuse_address = True
+
+  def __init__(self, address: tuple[str, int], handle_req: Callable, clients: list[client.TcpClient], threads = POOL_SIZE, queue_size = ACCEPT_QUEUE_SIZE):
+    self.handle_req = handle_req
+    """Handler of the service, takes the client and the request and returns a response or `None`."""
+    self.clients = clients
+    self.clients_lock = TimedLock(f"clients:{address[1]}")
+    self.request_queue_size = queue_size
+    self.requests: queue.Queue[tuple] = queue.Queue(queue_size)
+    """Accepted connections waiting for a handler thread."""
+    self.refused = 0
+    super().__init__(address, GSRequestHandler)
+    self.threads = [threading.Thread(target=self.__work, name=f"{address[1]}-{idx}", daemon=True) for idx in range(threads)]
+    for thread in self.threads:
+      thread.start()
+
+  def process_request(self, request, client_address):
+    try:
+      self.requests.put_nowait((request, client_address))
+    except queue.Full:
+      self.refused += 1
+      self.shutdown_request(request)
+
+  def stats(self):
+    """Pool size and accept queue metrics."""
+    return {
+      "threads": len(self.threads),
+      "queued": self.requests.qsize(),
+      "refused": self.refused
+    }
+
+  def __work(self):
+    while True:
+      request, client_address = self.requests.get()
+      try:
+        self.finish_request(request, client_address)
+      except Exception:
+        self.handle_error(request, client_address)
+      finally:
+        self.shutdown_request(request)
+
+def serve(address: tuple[str, int], handle_req: Callable, clients: list[client.TcpClient], threads = POOL_SIZE):
+  """Serves a GS TCP service on a thread pool, blocking the calling thread."""
+  with PoolServer(address, handle_req, clients, threads) as server:
+    SERVERS.append(server)
+    try:
+      server.serve_forever()
+    finally:
+      SERVERS.remove(server)
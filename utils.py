@@ -1,4 +1,4 @@
-import array, socket
+import array, socket, struct, threading
 
 def read_u16(bts: bytes):
   """Reads a little endian u16."""
@@ -30,24 +30,14 @@ def write_u24_be(number: int):
 
 def read_as_u32_list(bts: bytes):
   """Converts a LE buffer into a list of u32."""
-  result: list[int] = []
   size = len(bts)
   if size % 4 != 0:
     raise BufferError("Unpadded buffer cast to u32 list.")
-  for i in range(0, size, 4):
-    nb = (bts[i] & 0xFF) + ((bts[i+1] << 8) & 0xff00) + ((bts[i+2] << 16) & 0xff0000) + ((bts[i+3] << 24) & 0xff000000)
-    result.append(nb)
-  return result
+  return list(struct.unpack_from(f'<{size // 4}I', bts))
 
 def write_u32_list(ints: list[int]):
   """Serializes u32 list into a LE buffer."""
-  bts = bytearray()
-  for i in ints:
-    bts.append(i & 0xff)
-    bts.append((i >> 8) & 0xff)
-    bts.append((i >> 16) & 0xff)
-    bts.append((i >> 24) & 0xff)
-  return bytes(bts)
+  return struct.pack(f'<{len(ints)}I', *[i & 0xFFFFFFFF for i in ints])
 
 def read_u32(bts: bytes):
   """Reads a little endian u32."""
@@ -91,3 +81,38 @@ def read_ipv4(ip: bytes):
   if len(ip) != 4:
     raise BufferError("Invalid IPv4 address buffer size")
   return socket.inet_ntoa(ip[::-1])
+
+class OpTimer:
+  """Call count and cumulative time of an operation, offloaded ones include queueing."""
+  def __init__(self):
+    self.calls = 0
+    self.total = 0.0
+    self.max = 0.0
+    self.__lock = threading.Lock()
+
+  def record(self, elapsed: float):
+    with self.__lock:
+      self.calls += 1
+      self.total += elapsed
+      self.max = max(self.max, elapsed)
+
+  def merge(self, other: "OpTimer"):
+    """Adds the calls of another timer, e.g. reported by another process."""
+    with self.__lock:
+      self.calls += other.calls
+      self.total += other.total
+      self.max = max(self.max, other.max)
+    return self
+
+  def __getstate__(self):
+    state = self.__dict__.copy()
+    del state["_OpTimer__lock"]
+    return state
+
+  def __setstate__(self, state: dict):
+    self.__dict__.update(state)
+    self.__lock = threading.Lock()
+
+  def __repr__(self):
+    mean = self.total / self.calls if self.calls > 0 else 0.0
+    return f"<{self.calls} calls, mean {mean * 1000:.3f}ms, max {self.max * 1000:.3f}ms>"